@@ -1,99 +1,443 @@
-import qrcode
 import os
 import io
 import base64
-from flask import Flask, request, jsonify
-from flask_sqlalchemy import SQLAlchemy
+import click
+import csv
+import functools
+import gzip
+import hashlib
+import heapq
+import hmac
+import itertools
+import json
+import logging
+import multiprocessing
+import re
+import sqlite3
+import time
+import zipfile
+import zlib
+import threading
+import uuid
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from flask import (
+    Blueprint, Flask, Response, current_app, make_response, request, jsonify, stream_with_context
+)
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
-import traceback
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+from markupsafe import escape
+from sqlalchemy import and_, case, event as sqlalchemy_event, func, or_, tuple_
+from sqlalchemy.engine import Engine
 from datetime import date
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
-
-# Initialize Flask app
-app = Flask(__name__)
-
-# Enable CORS for specific routes and origins
-CORS(app, resources={r"/*": {"origins": ["http://localhost:5173", "http://localhost:5174"]}}, supports_credentials=True)
-
-# Configure MySQL database
-app.config['SQLALCHEMY_DATABASE_URI'] = 'mysql+pymysql://root@localhost/events'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-db = SQLAlchemy(app)
-
-# Database Models
-class Event(db.Model):
-    __tablename__ = 'event'
-    event_id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer)
-    event_name = db.Column(db.String(255))
-    event_description = db.Column(db.Text)
-    type = db.Column(db.String(255), nullable=True)  # Added 'type' column
-    slot = db.Column(db.Integer, nullable=True)  # Added 'size' column
-    speaker = db.Column(db.String(255))
-    location = db.Column(db.String(255))
-    event_date = db.Column(db.Date)
-    start_time = db.Column(db.Time)
-    end_time = db.Column(db.Time)
-    created_at = db.Column(db.DateTime)
-    updated_at = db.Column(db.DateTime)
-
-class Attendance(db.Model):
-    __tablename__ = 'attendance'
-    attendance_ID = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    event_id = db.Column(db.Integer, db.ForeignKey('event.event_id'), nullable=False)
-    student_id = db.Column(db.Integer, nullable=False)
-    firstName = db.Column(db.String(256))
-    lastName = db.Column(db.String(256))
-    year_and_block = db.Column(db.String(50), nullable=False)
-    department = db.Column(db.String(256), nullable=False)
-    check_in = db.Column(db.DateTime, nullable=True)  
-    check_out = db.Column(db.DateTime, nullable=True)  
-    status = db.Column(db.String(20), nullable=False)
-    
+from datetime import time as time_of_day
+from werkzeug.security import check_password_hash
+
+from archive import (
+    ARCHIVE_DIR, ARCHIVE_RETENTION_DAYS, archive_events, archived_event_ids, archived_records, archived_rows,
+    is_archived
+)
+from cache import event_cache, event_snapshot, get_cached_event, make_cache_backend, qr_cache
+from credentials import prepare_participant_credentials, render_qr_png
+from feed import FEED_KEEPALIVE, attendance_feed, check_in_delta, check_out_delta, publish_attendance, sse_message
+from journal import JOURNAL_FLUSH_BATCH, AttendanceFlusher, attendance_journal, scan_idempotency_key
+from metrics import (
+    METRICS, TimedQueuePool, configure_logging, log_event, pool_gauges, qr_render_time, record_request_stats,
+    start_request_stats
+)
+from models import (
+    AppliedScan, ArchivedEvent, Attendance, DataVersion, Event, EventCapacity, EventRegistration, EventSummary,
+    Participant, analytics_groups, bump_versions, checked_in_count, db, fill_from_waitlist, increment_event_summary,
+    init_event_capacity, insert_ignore, migrate_schema, promote_from_waitlist, rebuild_event_summary, release_seat,
+    take_seat
+)
+
+# Optional speedups: orjson for encoding large JSON arrays, brotli for compressing them
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# All routes and CLI commands live on this blueprint; create_app() builds the Flask app around it
+api = Blueprint('api', __name__, cli_group=None)
+
+def env_flag(name, default):
+    return os.environ.get(name, default).lower() in ('1', 'true', 'yes')
+
+def load_config():
+    # Everything deployment-specific comes from the environment
+    uri = os.environ.get('DATABASE_URL', 'mysql+pymysql://root@localhost/events')
+    statement_timeout_ms = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 0))
+
+    if uri.startswith('sqlite'):
+        # Local stand-in for MySQL: let every server thread share the file, waiting on locks instead of failing
+        engine_options = {'connect_args': {'check_same_thread': False, 'timeout': 30}}
+    else:
+        engine_options = {
+            'pool_size': int(os.environ.get('DB_POOL_SIZE', 10)),
+            'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 20)),
+            'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 280)),  # below MySQL's wait_timeout
+            'pool_pre_ping': env_flag('DB_POOL_PRE_PING', 'true'),
+            'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 30)),
+            'poolclass': TimedQueuePool
+        }
+        if uri.startswith('mysql') and statement_timeout_ms:
+            engine_options['connect_args'] = {'init_command': f"SET SESSION max_execution_time={statement_timeout_ms}"}
+
+    return {
+        'SQLALCHEMY_DATABASE_URI': uri,
+        'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+        'SQLALCHEMY_ENGINE_OPTIONS': engine_options,
+        # Signs session tokens; must be set and identical on every worker in production
+        'SECRET_KEY': os.environ.get('SECRET_KEY'),
+        'CORS_ORIGINS': os.environ.get('CORS_ORIGINS', 'http://localhost:5173,http://localhost:5174').split(',')
+    }
+
+class OrjsonProvider(DefaultJSONProvider):
+    # Same JSON as Flask's provider, encoded by orjson; dates still go through Flask's default handling
+    def dumps(self, obj, **kwargs):
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if kwargs.get('indent'):
+            option |= orjson.OPT_INDENT_2
+        if kwargs.get('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=self.default, option=option).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+def create_app(config=None):
+    app = Flask(__name__)
+    app.config.update(load_config())
+    app.config.update(config or {})
+    configure_logging()
+    if not app.config['SECRET_KEY']:
+        # A per-process key would make tokens from one worker fail on the others and log everyone out on restart
+        if not (app.debug or app.testing):
+            raise RuntimeError("SECRET_KEY must be set outside debug mode")
+        app.config['SECRET_KEY'] = os.urandom(32).hex()
+        if not QR_SIGNING_KEYS:
+            log_event('ephemeral_signing_key', logging.WARNING,
+                      detail="QR badges signed now stop verifying after a restart; set SECRET_KEY or QR_SIGNING_KEYS")
+
+    # Enable CORS for specific routes and origins
+    # The Svelte app runs on another origin, so headers it reads (the page cursor) have to be exposed
+    CORS(app, resources={r"/*": {"origins": app.config['CORS_ORIGINS']}}, supports_credentials=True,
+         expose_headers=['X-Next-Cursor'])
+
+    if orjson is not None:
+        app.json = OrjsonProvider(app)
+
+    db.init_app(app)
+    app.register_blueprint(api)
+    return app
+
+@sqlalchemy_event.listens_for(Engine, 'connect')
+def configure_sqlite_connection(dbapi_connection, connection_record):
+    # WAL lets readers keep going while a request writes
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        dbapi_connection.execute('PRAGMA journal_mode=WAL')
+
+# Request timing and SQL statement counts for /metrics and the slow-request log
+api.before_app_request(start_request_stats)
+api.after_app_request(record_request_stats)
+
+def attendance_rate(registration_count, check_in_count):
+    return round(check_in_count / registration_count, 4) if registration_count else 0.0
+
+def split_fullname(fullname):
+    # Scanners and the registration form only send 'fullname'; the tables store first and last name
+    parts = (fullname or '').strip().split(' ', 1)
+    return parts[0], parts[1] if len(parts) > 1 else ''
+
+def scan_names(scan):
+    # Scans resolved from a signed QR already carry the exact first and last name
+    if 'firstName' in scan:
+        return scan['firstName'], scan.get('lastName', '')
+    return split_fullname(scan['fullname'])
+
+def parse_scan_time(value):
+    # Offline scanners send the time the badge was scanned, otherwise use now
+    if not value:
+        return datetime.utcnow()
+    return datetime.fromisoformat(value)
+
+def event_qr_payload(event):
+    return f"{event.event_id},{event.event_name},{event.location}"
+
+def png_response(key, png):
+    # The payload hash doubles as the ETag, so unchanged images are answered with 304
+    response = Response(png, mimetype='image/png')
+    response.set_etag(key)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+# CPU-bound work (password hashing, QR rendering) runs in worker processes so request threads stay free
+WORKER_PROCESSES = int(os.environ.get('WORKER_PROCESSES', os.cpu_count() or 2))
+WORKER_TIMEOUT = 30  # seconds
+_worker_pool = None
+_worker_pool_lock = threading.Lock()
+
+def worker_pool():
+    # Created lazily so each server process starts its own pool. Its processes come from a forkserver that
+    # preloads the credentials module, since forking a threaded server process is unsafe. Every pool process
+    # also re-runs the main script as __mp_main__: under gunicorn that is gunicorn's launcher, and under
+    # `python app.py` it is app.py, which then skips building the app (see the end of this file)
+    global _worker_pool
+    with _worker_pool_lock:
+        if _worker_pool is None:
+            context = multiprocessing.get_context('forkserver')
+            context.set_forkserver_preload(['credentials'])
+            _worker_pool = ProcessPoolExecutor(max_workers=WORKER_PROCESSES, mp_context=context)
+        return _worker_pool
+
+def reset_worker_pool():
+    # A forked server worker must not reuse the parent's pool or its lock
+    global _worker_pool, _worker_pool_lock
+    _worker_pool = None
+    _worker_pool_lock = threading.Lock()
+
+os.register_at_fork(after_in_child=reset_worker_pool)
+
+def discard_worker_pool(pool):
+    # A pool whose process died is broken for good; the next worker_pool() call starts a fresh one
+    global _worker_pool
+    with _worker_pool_lock:
+        if _worker_pool is pool:
+            _worker_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+    log_event('worker_pool_broken', logging.ERROR)
+
+def pool_map(fn, *iterables, **kwargs):
+    # worker_pool().map, discarding the pool if it breaks so that the next call starts a fresh one
+    pool = worker_pool()
+    try:
+        yield from pool.map(fn, *iterables, **kwargs)
+    except BrokenProcessPool:
+        discard_worker_pool(pool)
+        raise
+
+def prime_stream(chunks, count):
+    # Produces the first chunks before the response starts, so a failure there still gets a proper status code
+    head = list(itertools.islice(chunks, count))
+    return itertools.chain(head, chunks)
+
+# Participant QR payloads are signed so scans can be trusted without a database lookup.
+# QR_SIGNING_KEYS is "version:secret,..." with the current key first; older keys keep verifying old badges.
+QR_SIGNING_KEYS = [
+    tuple(entry.split(':', 1)) for entry in os.environ.get('QR_SIGNING_KEYS', '').split(',') if ':' in entry
+]
+
+def qr_signing_keys():
+    # Without configured keys, sign with the app's SECRET_KEY as version k0; create_app() makes sure that key is
+    # fixed outside debug mode, since signed badges are stored and must verify on every worker and after restarts
+    return QR_SIGNING_KEYS or [('k0', current_app.config['SECRET_KEY'])]
+
+def qr_signature(key, payload):
+    return hmac.new(key.encode('utf-8'), payload.encode('utf-8'), hashlib.sha256).hexdigest()[:32]
+
+def participant_qr_payload(student_id, first_name, last_name, department):
+    payload = f"{student_id},{first_name},{last_name},{department}"
+    version, key = qr_signing_keys()[0]
+    return f"{payload},{version},{qr_signature(key, payload)}"
+
+def verify_participant_qr(qr_text):
+    # Returns (student_id, first_name, last_name, department), or None for forged or unknown-key payloads
+    try:
+        payload, version, signature = qr_text.rsplit(',', 2)
+        student_id, first_name, last_name, department = payload.split(',', 3)
+        student_id = int(student_id)
+    except (AttributeError, ValueError):
+        return None
+    key = dict(qr_signing_keys()).get(version)
+    if key is None or not hmac.compare_digest(qr_signature(key, payload), signature):
+        return None
+    return student_id, first_name, last_name, department
+
+# How often a worker re-reads an event's registrations version; a registration or cancellation made through
+# another worker is seen within this many seconds, this process's own writes forget the set right away
+REGISTRATION_RECHECK_INTERVAL = float(os.environ.get('REGISTRATION_RECHECK_INTERVAL', 0.5))
+
+class RegistrationIndex:
+    # Registered students per event (student_id -> year_and_block). Each set is tagged with the event's
+    # 'registrations:<event_id>' data version and reloaded once that changes; the version itself is read
+    # at most once per REGISTRATION_RECHECK_INTERVAL, so a burst of scans costs one primary-key read
+    def __init__(self):
+        self._events = {}
+        self._lock = threading.Lock()
+
+    def registered(self, event_id):
+        cached = self._events.get(event_id)
+        now = time.monotonic()
+        if cached is not None and now - cached[2] < REGISTRATION_RECHECK_INTERVAL:
+            return cached[1]
+        version = db.session.query(DataVersion.version).filter_by(name=f"registrations:{event_id}").scalar() or 0
+        if cached is not None and cached[0] == version:
+            registered = cached[1]
+        else:
+            # Read after the version, so a write landing in between only causes one more reload
+            registered = dict(
+                db.session.query(EventRegistration.student_id, EventRegistration.year_and_block)
+                .filter_by(event_id=event_id, registration_status='registered').all()
+            )
+        with self._lock:
+            self._events[event_id] = (version, registered, now)
+        return registered
+
+    def lookup(self, event_id, student_id):
+        return self.registered(event_id).get(student_id)
+
+    def forget(self, event_id):
+        with self._lock:
+            self._events.pop(event_id, None)
+
+registration_index = RegistrationIndex()
+
+def resolve_qr_scan(scan):
+    # Turn {'event_id', 'qr', ...} into a full scan, or return an error for forged or unregistered badges
+    fields = verify_participant_qr(scan.get('qr'))
+    if fields is None:
+        return None, 'Invalid QR code'
+    try:
+        event_id = int(scan.get('event_id'))
+    except (TypeError, ValueError):
+        return None, 'Invalid event_id'
+    student_id, first_name, last_name, department = fields
+    year_and_block = registration_index.lookup(event_id, student_id)
+    if year_and_block is None:
+        return None, 'Student is not registered for this event'
+    return dict(
+        scan, event_id=event_id, student_id=student_id, firstName=first_name, lastName=last_name,
+        fullname=f"{first_name} {last_name}", year_and_block=year_and_block, department=department
+    ), None
+
+# Signed, expiring participant session tokens
+ACCESS_TOKEN_TTL = int(os.environ.get('ACCESS_TOKEN_TTL', 15 * 60))  # seconds
+REFRESH_TOKEN_TTL = int(os.environ.get('REFRESH_TOKEN_TTL', 7 * 24 * 3600))  # seconds
+PARTICIPANT_CLAIMS = ['student_Id', 'firstName', 'lastName', 'email', 'department']
+
+# Revoked token ids; entries only need to outlive the longest token, and none is dropped before then, since an
+# evicted revocation would make the token valid again. The memory:// default is per process, so multi-worker
+# deployments set TOKEN_REVOCATION_URL to a shared SQLite file
+revoked_tokens = make_cache_backend(os.environ.get('TOKEN_REVOCATION_URL', 'memory://'), None)
+
+# Password checks are deliberately slow, so logins get a few threads of their own and a bounded queue.
+# Every waiting login holds a request thread, so the limit stays below the worker's WEB_THREADS
+# (see gunicorn.conf.py) and the other routes keep threads to run on
+LOGIN_WORKERS = int(os.environ.get('LOGIN_WORKERS', 4))
+LOGIN_QUEUE_LIMIT = min(int(os.environ.get('LOGIN_QUEUE_LIMIT', LOGIN_WORKERS + 2)),
+                        max(int(os.environ.get('WEB_THREADS', 8)) - 1, 1))
+login_executor = ThreadPoolExecutor(max_workers=LOGIN_WORKERS, thread_name_prefix='login')
+login_slots = threading.BoundedSemaphore(LOGIN_QUEUE_LIMIT)
+
+def token_serializer(token_type):
+    # A separate salt per token type keeps refresh tokens from being accepted as access tokens
+    return URLSafeTimedSerializer(current_app.config['SECRET_KEY'], salt=f"participant-{token_type}")
+
+def issue_tokens(profile):
+    claims = {field: profile[field] for field in PARTICIPANT_CLAIMS}
+    return {
+        "access_token": token_serializer('access').dumps(dict(claims, jti=uuid.uuid4().hex)),
+        "refresh_token": token_serializer('refresh').dumps(dict(claims, jti=uuid.uuid4().hex)),
+        "token_type": "Bearer",
+        "expires_in": ACCESS_TOKEN_TTL
+    }
 
-class Participant(db.Model):
-    __tablename__ = 'participant'
-    student_Id = db.Column(db.Integer, primary_key=True)
-    password = db.Column(db.String(256))
-    firstName = db.Column(db.String(256))
-    lastName = db.Column(db.String(256))
-    email = db.Column(db.String(256))
-    department = db.Column(db.Text)
-
-class User(db.Model):
-    __tablename__ = 'user'
-    user_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    username = db.Column(db.String(255), unique=True, nullable=False)
-    password = db.Column(db.String(256), nullable=False)
-    email = db.Column(db.String(255), unique=True, nullable=False)
-    role = db.Column(db.String(50), nullable=False)
-    created_at = db.Column(db.DateTime, default=db.func.now())
-    updated_at = db.Column(db.DateTime, default=db.func.now(), onupdate=db.func.now())
-
-class EventRegistration(db.Model):
-    __tablename__ = 'event_registration'
-
-    registration_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    event_id = db.Column(db.Integer, nullable=False)  # Foreign key to the Events table
-    student_id = db.Column(db.Integer, nullable=False)
-    firstName = db.Column(db.String(256))
-    lastName = db.Column(db.String(256))
-    year_and_block = db.Column(db.String(256), nullable=False)
-    department = db.Column(db.String(256), nullable=False)
-    registration_date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
-    registration_status = db.Column(db.String(256), nullable=False, default="registered")
+def verify_token(token, token_type):
+    # Signature and expiry are checked in memory (constant-time HMAC comparison), no database involved
+    max_age = ACCESS_TOKEN_TTL if token_type == 'access' else REFRESH_TOKEN_TTL
+    try:
+        claims = token_serializer(token_type).loads(token, max_age=max_age)
+    except BadSignature:  # also raised for expired tokens
+        return None
+    if revoked_tokens.get(claims['jti']):
+        return None
+    return claims
+
+def revoke_token(claims):
+    revoked_tokens.set(claims['jti'], True, REFRESH_TOKEN_TTL)
+
+def bearer_claims():
+    header = request.headers.get('Authorization', '')
+    if not header.startswith('Bearer '):
+        return None
+    return verify_token(header[len('Bearer '):], 'access')
+
+def participant_profile(claims):
+    return {field: claims[field] for field in PARTICIPANT_CLAIMS}
+
+# Conditional GET and compression for the polled list endpoints
+COMPRESS_MIN_SIZE = 1024  # bytes
+
+def version_etag(names):
+    # One primary-key lookup instead of reading the rows; the query string is part of the tag
+    versions = dict(db.session.query(DataVersion.name, DataVersion.version).filter(DataVersion.name.in_(names)).all())
+    token = ','.join(f"{name}={versions.get(name, 0)}" for name in names) + '|' + request.full_path
+    return hashlib.sha1(token.encode('utf-8')).hexdigest()
+
+def compress_response(response):
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_SIZE or 'Content-Encoding' in response.headers:
+        return response
+    encoding = request.accept_encodings.best_match(['br', 'gzip'] if brotli else ['gzip'])
+    if encoding == 'br':
+        data = brotli.compress(data, quality=4)
+    elif encoding == 'gzip':
+        data = gzip.compress(data, compresslevel=6)
+    else:
+        return response
+    response.set_data(data)
+    response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    return response
+
+def conditional_response(*version_names):
+    # Version names may use route arguments, e.g. 'attendance:{event_id}'
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(**kwargs):
+            # Weak tags, because the same tag is served for the compressed and uncompressed body
+            etag = version_etag([name.format(**kwargs) for name in version_names])
+            if request.if_none_match.contains_weak(etag):
+                response = Response(status=304)
+                response.set_etag(etag, weak=True)
+                return response
+            response = make_response(view(**kwargs))
+            if response.status_code == 200:
+                response.set_etag(etag, weak=True)
+                compress_response(response)
+            return response
+        return wrapper
+    return decorator
+
+@api.cli.command('migrate-schema')
+def migrate_schema_command():
+    changes = migrate_schema()
+    print(f"Applied: {', '.join(changes)}" if changes else "Schema already up to date")
+
+@api.cli.command('rebuild-summaries')
+def rebuild_summaries_command():
+    print(f"Rebuilt report summaries for {rebuild_event_summary()} events")
 
 
 # Routes for Event Management
-@app.route('/events/<int:event_id>', methods=['GET'])
+@api.route('/events/<int:event_id>', methods=['GET'])
 def get_event(event_id):
-    event = Event.query.get(event_id)
+    event = get_cached_event(event_id)
     if not event:
         return jsonify({"error": "Event not found"}), 404
 
-    return jsonify({
+    return jsonify(serialize_event(event)), 200
+
+def serialize_event(event):
+    return {
         "event_id": event.event_id,
         "event_name": event.event_name,
         "description": event.event_description,
@@ -101,47 +445,171 @@ def get_event(event_id):
         "event_date": event.event_date.strftime('%Y-%m-%d'),
         "start_time": event.start_time.strftime('%H:%M:%S'),
         "end_time": event.end_time.strftime('%H:%M:%S')
-    }), 200
+    }
 
-@app.route('/attendance/<int:event_id>', methods=['GET'])
+@api.route('/attendance/<int:event_id>', methods=['GET'])
 def get_attendance(event_id):
-    attendance_records = Attendance.query.filter_by(event_ID=event_id).all()
+    # Participants are joined in the same query instead of being fetched one by one
+    attendance_records = db.session.query(Attendance, Participant).join(
+        Participant, Participant.student_Id == Attendance.student_id
+    ).filter(Attendance.event_id == event_id).all()
     if not attendance_records:
         return jsonify({"error": "No attendance records found for this event"}), 404
 
     participants = []
-    for record in attendance_records:
-        participant = Participant.query.get(record.participant_ID)
-        if participant:
-            participants.append({
-                "participant_id": participant.student_Id,
-                "name": f"{participant.firstName} {participant.lastName}",
-                "check_in": record.check_in,
-                "status": record.status
-            })
+    for record, participant in attendance_records:
+        participants.append({
+            "participant_id": participant.student_Id,
+            "name": f"{participant.firstName} {participant.lastName}",
+            "check_in": record.check_in,
+            "status": record.status
+        })
 
     return jsonify({"event_id": event_id, "attendance": participants}), 200
 
-@app.route('/api/events', methods=['GET'])
+# Event dashboard: event, registrations and attendance in one response, three queries total for current events
+@api.route('/api/events/<int:event_id>/dashboard', methods=['GET'])
+@conditional_response('events', 'registrations:{event_id}', 'attendance:{event_id}')
+def get_event_dashboard(event_id):
+    event = get_cached_event(event_id)
+    if not event:
+        return jsonify({"error": "Event not found"}), 404
+
+    # Read before the rows so a client resuming the live stream from here cannot miss a delta
+    feed_seq = attendance_feed.latest(event_id)
+
+    # Registrations LEFT JOIN attendance tells which registrants have not shown up
+    registrations = db.session.query(EventRegistration, Attendance.check_in).outerjoin(
+        Attendance,
+        and_(Attendance.event_id == EventRegistration.event_id, Attendance.student_id == EventRegistration.student_id)
+    ).filter(EventRegistration.event_id == event_id).all()
+    attendance_records = Attendance.query.filter_by(event_id=event_id).all()
+    if is_archived(event_id):
+        archived_attendance = archived_records(event_id, 'attendance')
+        checked_in_at = {record.student_id: record.check_in for record in archived_attendance}
+        registrations += [(reg, checked_in_at.get(reg.student_id)) for reg in archived_records(event_id, 'registrations')]
+        attendance_records += archived_attendance
+
+    # Every row is listed, but only confirmed registrations count; waitlisted students hold no seat
+    registration_list = []
+    registered = waitlisted = registered_checked_in = 0
+    for reg, check_in in registrations:
+        registration = serialize_registration(reg)
+        registration["checked_in"] = check_in is not None
+        if reg.registration_status == 'registered':
+            registered += 1
+            registered_checked_in += check_in is not None
+        elif reg.registration_status == 'waitlisted':
+            waitlisted += 1
+        registration_list.append(registration)
+
+    checked_in = sum(1 for record in attendance_records if record.check_in is not None)
+    checked_out = sum(1 for record in attendance_records if record.check_out is not None)
+
+    return jsonify({
+        "event": serialize_event(event),
+        "feed_seq": feed_seq,
+        "registrations": registration_list,
+        "attendance": [serialize_attendance(record) for record in attendance_records],
+        "counts": {
+            "registered": registered,
+            "waitlisted": waitlisted,
+            "checked_in": checked_in,
+            "checked_out": checked_out,
+            "registered_not_checked_in": registered - registered_checked_in,
+            "walk_ins": checked_in - registered_checked_in,
+            "attendance_rate": attendance_rate(registered, registered_checked_in)
+        }
+    }), 200
+
+@api.route('/api/events', methods=['GET'])
+@conditional_response('events')
 def get_all_events():
-    events = Event.query.all()
+    # Only the requested columns are selected; the default matches the original listing
+    fields = request.args.get('fields')
+    fields = fields.split(',') if fields else DEFAULT_EVENT_LIST_FIELDS
+    unknown = [field for field in fields if field not in EVENT_LIST_FIELDS]
+    if unknown:
+        return jsonify({"error": f"Unknown fields: {', '.join(unknown)}"}), 400
+
+    # The cursor columns are always selected so the next page can be computed
+    columns = list(dict.fromkeys(['event_id', 'event_date'] + fields))
+    query = db.session.query(*[EVENT_LIST_FIELDS[field] for field in columns])
+
+    try:
+        if request.args.get('date_from'):
+            query = query.filter(Event.event_date >= date.fromisoformat(request.args['date_from']))
+        if request.args.get('date_to'):
+            query = query.filter(Event.event_date <= date.fromisoformat(request.args['date_to']))
+    except ValueError as ve:
+        return jsonify({"error": f"Invalid date format: {ve}"}), 400
+    if request.args.get('type'):
+        query = query.filter(Event.type == request.args['type'])
+
+    # Keyset pagination on (event_date, event_id) is opt-in via limit or cursor; undated events have no
+    # position in that order, so they are only listed without pagination
+    limit = request.args.get('limit', type=int)
+    cursor = request.args.get('cursor')
+    if cursor or limit:
+        query = query.filter(Event.event_date.isnot(None))
+    if cursor:
+        try:
+            cursor_date, cursor_id = decode_event_cursor(cursor)
+        except ValueError:
+            return jsonify({"error": "Invalid cursor"}), 400
+        query = query.filter(or_(
+            Event.event_date > cursor_date,
+            and_(Event.event_date == cursor_date, Event.event_id > cursor_id)
+        ))
+    query = query.order_by(Event.event_date, Event.event_id)
+    if cursor or limit:
+        limit = min(max(limit or MAX_EVENT_PAGE_SIZE, 1), MAX_EVENT_PAGE_SIZE)
+        rows = query.limit(limit + 1).all()
+    else:
+        rows = query.all()
+
+    next_cursor = None
+    if (cursor or limit) and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_event_cursor(rows[-1].event_date, rows[-1].event_id)
+
     event_list = [
-        {
-            "event_id": event.event_id,
-            "event_name": event.event_name,
-            "event_description": event.event_description,
-            "speaker": event.speaker,
-            "location": event.location,
-            "event_date": event.event_date.strftime('%Y-%m-%d'),
-            "start_time": event.start_time.strftime('%H:%M:%S'),
-            "end_time": event.end_time.strftime('%H:%M:%S')
-        }
-        for event in events
+        {field: format_column_value(getattr(row, field)) for field in fields}
+        for row in rows
     ]
-    return jsonify(event_list), 200
+    response = jsonify(event_list)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response, 200
+
+EVENT_LIST_FIELDS = {
+    column: getattr(Event, column)
+    for column in ['event_id', 'user_id', 'event_name', 'event_description', 'type', 'slot', 'speaker',
+                   'location', 'event_date', 'start_time', 'end_time', 'created_at', 'updated_at']
+}
+DEFAULT_EVENT_LIST_FIELDS = ['event_id', 'event_name', 'event_description', 'speaker', 'location',
+                             'event_date', 'start_time', 'end_time']
+MAX_EVENT_PAGE_SIZE = 500
+
+def format_column_value(value):
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, date):
+        return value.strftime('%Y-%m-%d')
+    if hasattr(value, 'strftime'):  # TIME columns
+        return value.strftime('%H:%M:%S')
+    return value
+
+def encode_event_cursor(event_date, event_id):
+    return base64.urlsafe_b64encode(f"{event_date.isoformat()},{event_id}".encode('utf-8')).decode('ascii')
+
+def decode_event_cursor(cursor):
+    # Malformed base64, text or values all surface as ValueError
+    event_date, event_id = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8').split(',')
+    return date.fromisoformat(event_date), int(event_id)
 
 #Event Creation
-@app.route('/api/events', methods=['POST'])
+@api.route('/api/events', methods=['POST'])
 def create_event():
     data = request.json
     required_fields = ['event_name', 'event_description', 'location', 'event_date', 'start_time', 'end_time', 'type', 'slot']
@@ -153,10 +621,10 @@ def create_event():
 
     try:
         event_date = date.fromisoformat(data['event_date'])
-        start_time = data['start_time']
-        end_time = data['end_time']
+        start_time = time_of_day.fromisoformat(data['start_time'])
+        end_time = time_of_day.fromisoformat(data['end_time'])
         slot = int(data['slot']) if 'slot' in data else 0  # Ensure slot is an integer
-    except ValueError as ve:
+    except (TypeError, ValueError) as ve:
         return jsonify({"error": f"Invalid date/time/slot format: {ve}"}), 400
 
     # Create the event in the database
@@ -174,7 +642,11 @@ def create_event():
 
     try:
         db.session.add(new_event)
+        db.session.flush()
+        insert_ignore(EventCapacity, [{'event_id': new_event.event_id, 'remaining': slot if slot > 0 else None}])
+        bump_versions('events')
         db.session.commit()
+        event_cache.refresh(new_event.event_id, event_snapshot(new_event))
 
         return jsonify({"message": "Event created successfully", "event_id": new_event.event_id}), 201
     except Exception as e:
@@ -182,7 +654,7 @@ def create_event():
         return jsonify({"error": "An error occurred during event creation.", "details": str(e)}), 500
 
 #Event Updating
-@app.route('/api/events', methods=['PUT'])
+@api.route('/api/events', methods=['PUT'])
 def update_event():
     data = request.json
     if not data or 'event_id' not in data:
@@ -192,19 +664,43 @@ def update_event():
     if not event:
         return jsonify({"error": "Event not found"}), 404
 
+    # Date and Time columns only accept date/time objects, so parse before touching the event
+    try:
+        event_date = date.fromisoformat(data['event_date']) if 'event_date' in data else event.event_date
+        start_time = time_of_day.fromisoformat(data['start_time']) if 'start_time' in data else event.start_time
+        end_time = time_of_day.fromisoformat(data['end_time']) if 'end_time' in data else event.end_time
+        slot = int(data['slot']) if 'slot' in data else event.slot
+    except (TypeError, ValueError) as ve:
+        return jsonify({"error": f"Invalid date/time/slot format: {ve}"}), 400
+
+    old_qr_payload = event_qr_payload(event)
+    old_slot = event.slot
+
     # Update event details
     event.event_name = data.get('event_name', event.event_name)
     event.event_description = data.get('event_description', event.event_description)
     event.location = data.get('location', event.location)
     event.speaker = data.get('speaker', event.speaker)
-    event.event_date = data.get('event_date', event.event_date)
-    event.start_time = data.get('start_time', event.start_time)
-    event.end_time = data.get('end_time', event.end_time)
+    event.event_date = event_date
+    event.start_time = start_time
+    event.end_time = end_time
     event.type = data.get('type', event.type)  # Update type
-    event.slot = int(data.get('slot', event.slot))  # Update slot, ensure integer
+    event.slot = slot
 
     try:
+        if event.slot != old_slot:
+            # Recount the seats for the new capacity and let waitlisted students into any new ones
+            EventCapacity.query.filter_by(event_id=event.event_id).delete()
+            init_event_capacity([event.event_id])
+            fill_from_waitlist(event.event_id)
+            bump_versions(f"registrations:{event.event_id}")
+        bump_versions('events')
         db.session.commit()
+        event_cache.invalidate(event.event_id)
+        registration_index.forget(event.event_id)
+        # Name or location changes alter the QR payload, so the old image is stale
+        if event_qr_payload(event) != old_qr_payload:
+            qr_cache.invalidate(old_qr_payload)
         return jsonify({"message": "Event updated successfully"}), 200
     except Exception as e:
         db.session.rollback()
@@ -213,14 +709,21 @@ def update_event():
 
 #Delete Event
 
-@app.route('/api/events/<int:event_id>', methods=['DELETE'])
+@api.route('/api/events/<int:event_id>', methods=['DELETE'])
 def delete_event(event_id):
     try:
         # Use ORM to fetch and delete the event
         event = Event.query.get(event_id)
         if event:
+            qr_payload = event_qr_payload(event)
             db.session.delete(event)
+            EventSummary.query.filter_by(event_id=event_id).delete()
+            EventCapacity.query.filter_by(event_id=event_id).delete()
+            bump_versions('events')
             db.session.commit()
+            event_cache.invalidate(event_id)
+            registration_index.forget(event_id)
+            qr_cache.invalidate(qr_payload)
             return jsonify({"message": "Event deleted successfully"}), 200
         
         # If event is not found, return 404
@@ -230,7 +733,7 @@ def delete_event(event_id):
         return jsonify({"error": "An error occurred while deleting the event", "details": str(e)}), 500
 
 # Routes for Login and Signup
-@app.route('/api/participant/signup', methods=['POST'])
+@api.route('/api/participant/signup', methods=['POST'])
 def participant_signup():
     data = request.json
 
@@ -247,40 +750,44 @@ def participant_signup():
     if existing_participant:
         return jsonify({"error": "Student ID or Email is already registered"}), 400
 
-    # Create a new participant
+    # Hash the password and render the QR code in a worker process
+    qr_data = participant_qr_payload(data['student_Id'], data['firstName'], data['lastName'], data['department'])
+    pool = worker_pool()
+    try:
+        password_hash, qr_png, render_seconds = pool.submit(
+            prepare_participant_credentials, data['password'], qr_data
+        ).result(timeout=WORKER_TIMEOUT)
+    except FutureTimeoutError:
+        return jsonify({"error": "Signup is busy, please try again."}), 503
+    except BrokenProcessPool:
+        discard_worker_pool(pool)
+        return jsonify({"error": "Signup is temporarily unavailable, please try again."}), 503
+    qr_render_time.observe(render_seconds)
+
+    # Create a new participant with the QR code stored as PNG bytes
     new_participant = Participant(
         student_Id=data['student_Id'],
-        password=generate_password_hash(data['password']),
+        password=password_hash,
         firstName=data['firstName'],
         lastName=data['lastName'],
         email=data['email'],
-        department=data['department']
+        department=data['department'],
+        qr_code=qr_png
     )
 
-    # Generate QR code
-    qr_data = f"{data['student_Id']},{data['firstName']},{data['lastName']},{data['department']}"
-    qr_img = qrcode.make(qr_data)
-
-    # Save QR code to a BytesIO object
-    img_byte_arr = io.BytesIO()
-    qr_img.save(img_byte_arr, format='PNG')
-    img_byte_arr.seek(0)
-    
-    # Encode the image to base64
-    qr_code_base64 = base64.b64encode(img_byte_arr.getvalue()).decode('utf-8')
-
-    # Assign the QR code to the new participant and save to database
-    new_participant.qr_code = qr_code_base64
-
     try:
         db.session.add(new_participant)
         db.session.commit()
-        return jsonify({"message": "Participant registered successfully", "qr_code": qr_code_base64}), 201
+        return jsonify({
+            "message": "Participant registered successfully",
+            "qr_code": base64.b64encode(qr_png).decode('utf-8'),
+            "qr_code_url": f"/api/participant/{new_participant.student_Id}/qr.png"
+        }), 201
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": "An error occurred during signup.", "details": str(e)}), 500
 
-@app.route('/api/participant/login', methods=['POST'])
+@api.route('/api/participant/login', methods=['POST'])
 def participant_login():
     data = request.json
 
@@ -292,25 +799,73 @@ def participant_login():
 
     # Find the participant by student_Id
     participant = Participant.query.filter_by(student_Id=data['student_Id']).first()
-    if not participant or not check_password_hash(participant.password, data['password']):
+    if not participant:
         return jsonify({"error": "Invalid Student ID or Password"}), 401
 
-    # Return success response
-    return jsonify({
-        "message": "Login successful",
-        "participant": {
-            "student_Id": participant.student_Id,
-            "firstName": participant.firstName,
-            "lastName": participant.lastName,
-            "email": participant.email,
-            "department": participant.department
-        }
-    }), 200
+    # Shed load instead of queueing without bound during a login storm
+    if not login_slots.acquire(blocking=False):
+        return jsonify({"error": "Too many logins in progress, please try again."}), 503, {'Retry-After': '1'}
+    try:
+        password_ok = login_executor.submit(
+            check_password_hash, participant.password, data['password']
+        ).result(timeout=WORKER_TIMEOUT)
+    except FutureTimeoutError:
+        return jsonify({"error": "Login is busy, please try again."}), 503
+    finally:
+        login_slots.release()
+    if not password_ok:
+        return jsonify({"error": "Invalid Student ID or Password"}), 401
+
+    profile = {
+        "student_Id": participant.student_Id,
+        "firstName": participant.firstName,
+        "lastName": participant.lastName,
+        "email": participant.email,
+        "department": participant.department
+    }
+
+    # Return success response with a session that later requests present instead of logging in again
+    return jsonify(dict(issue_tokens(profile), message="Login successful", participant=profile)), 200
+
+@api.route('/api/participant/token/refresh', methods=['POST'])
+def refresh_participant_token():
+    data = request.json or {}
+    claims = verify_token(data.get('refresh_token', ''), 'refresh')
+    if not claims:
+        return jsonify({"error": "Invalid or expired refresh token"}), 401
+
+    # Refresh tokens are single use: the old one is revoked as the new pair is issued
+    revoke_token(claims)
+    return jsonify(issue_tokens(claims)), 200
+
+@api.route('/api/participant/logout', methods=['POST'])
+def participant_logout():
+    data = request.json or {}
+    for claims in (bearer_claims(), verify_token(data.get('refresh_token', ''), 'refresh')):
+        if claims:
+            revoke_token(claims)
+    return jsonify({"message": "Logged out"}), 200
+
+# Logged-in participant, answered from the token alone
+@api.route('/api/participant/me', methods=['GET'])
+def get_current_participant():
+    claims = bearer_claims()
+    if not claims:
+        return jsonify({"error": "Invalid or expired token"}), 401
+    return jsonify(participant_profile(claims)), 200
 
 # Example route to retrieve participant data including QR code
-@app.route('/api/participant/<student_id>', methods=['GET'])
+@api.route('/api/participant/<student_id>', methods=['GET'])
 def get_participant(student_id):
-    print(f"Received request for student ID: {student_id}")  # Debugging output
+    log_event('participant_lookup', logging.DEBUG, sampled=True, student_id=student_id)
+
+    # A participant asking for their own profile is answered from their token
+    claims = bearer_claims()
+    if claims and str(claims['student_Id']) == str(student_id):
+        return jsonify(dict(
+            participant_profile(claims), qr_code_url=f"/api/participant/{claims['student_Id']}/qr.png"
+        )), 200
+
     participant = Participant.query.filter_by(student_Id=student_id).first()
     
     if not participant:
@@ -322,11 +877,28 @@ def get_participant(student_id):
         "lastName": participant.lastName,
         "email": participant.email,
         "department": participant.department,
-        "qr_code": participant.qr_code  # Return the QR code as well
+        "qr_code_url": f"/api/participant/{participant.student_Id}/qr.png"  # QR image is served separately
     }), 200
 
+# Participant QR image
+@api.route('/api/participant/<student_id>/qr.png', methods=['GET'])
+def get_participant_qr(student_id):
+    participant = Participant.query.filter_by(student_Id=student_id).first()
+    if not participant:
+        return jsonify({"error": "Participant not found"}), 404
+
+    png = participant.qr_code
+    if png:
+        return png_response(hashlib.sha256(png).hexdigest(), png)
+
+    # Accounts created before QR codes were stored get one rendered from the shared cache
+    key, png = qr_cache.get(participant_qr_payload(
+        participant.student_Id, participant.firstName, participant.lastName, participant.department
+    ))
+    return png_response(key, png)
+
   #Displaying of Name and User that is logged in currently
-@app.route('/api/participant/details', methods=['POST'])
+@api.route('/api/participant/details', methods=['POST'])
 def get_participant_details():
     data = request.json
 
@@ -334,6 +906,10 @@ def get_participant_details():
     if 'student_Id' not in data:
         return jsonify({"error": "'student_Id' is required"}), 400
 
+    claims = bearer_claims()
+    if claims and str(claims['student_Id']) == str(data['student_Id']):
+        return jsonify({"firstName": claims['firstName'], "lastName": claims['lastName']}), 200
+
     # Fetch the participant details
     participant = Participant.query.filter_by(student_Id=data['student_Id']).first()
     if not participant:
@@ -345,219 +921,1102 @@ def get_participant_details():
     }), 200
 
 
+# Bulk participant import (new intake)
+IMPORT_FIELDS = ['student_Id', 'password', 'firstName', 'lastName', 'email', 'department']
+IMPORT_CHUNK_SIZE = 500
+
+def import_participants(lines):
+    # Yields progress updates while importing CSV lines, then a final report with per-row errors
+    reader = csv.DictReader(lines)
+    errors = []
+    candidates = []
+    seen_ids, seen_emails = set(), set()
+    for row in reader:
+        line = reader.line_num
+        missing = [field for field in IMPORT_FIELDS if not (row.get(field) or '').strip()]
+        if missing:
+            errors.append({"line": line, "error": f"Missing fields: {', '.join(missing)}"})
+            continue
+        try:
+            row['student_Id'] = int(row['student_Id'])
+        except ValueError:
+            errors.append({"line": line, "error": "'student_Id' must be a number"})
+            continue
+        if row['student_Id'] in seen_ids or row['email'] in seen_emails:
+            errors.append({"line": line, "error": "Duplicate student ID or email within the file"})
+            continue
+        seen_ids.add(row['student_Id'])
+        seen_emails.add(row['email'])
+        candidates.append((line, row))
+
+    # One set-based query finds every student ID or email that is already registered
+    existing_ids, existing_emails = set(), set()
+    if candidates:
+        for student_id, email in db.session.query(Participant.student_Id, Participant.email).filter(or_(
+            Participant.student_Id.in_(seen_ids), Participant.email.in_(seen_emails)
+        )):
+            existing_ids.add(student_id)
+            existing_emails.add(email)
+    new_rows = []
+    for line, row in candidates:
+        if row['student_Id'] in existing_ids or row['email'] in existing_emails:
+            errors.append({"line": line, "error": "Student ID or Email is already registered"})
+        else:
+            new_rows.append((line, row))
+
+    total = len(new_rows)
+    yield {"processed": 0, "total": total}
+
+    # Hash and render across the worker processes, inserting each finished chunk in one statement
+    payloads = [
+        participant_qr_payload(row['student_Id'], row['firstName'], row['lastName'], row['department'])
+        for _, row in new_rows
+    ]
+    credentials = pool_map(
+        prepare_participant_credentials, [row['password'] for _, row in new_rows], payloads, chunksize=50
+    )
+    imported = skipped = processed = 0
+    chunk = []
+    for (line, row), (password_hash, qr_png, render_seconds) in zip(new_rows, credentials):
+        qr_render_time.observe(render_seconds)
+        chunk.append((line, {
+            'student_Id': row['student_Id'],
+            'password': password_hash,
+            'firstName': row['firstName'],
+            'lastName': row['lastName'],
+            'email': row['email'],
+            'department': row['department'],
+            'qr_code': qr_png
+        }))
+        if len(chunk) == IMPORT_CHUNK_SIZE or processed + len(chunk) == total:
+            # Students who signed up while the import was running: a taken student ID is skipped by the
+            # primary key, but email has no unique index, so the chunk's emails are checked again here
+            taken = {email for (email,) in db.session.query(Participant.email).filter(
+                Participant.email.in_([row['email'] for _, row in chunk])
+            )}
+            rows = []
+            for line, row in chunk:
+                if row['email'] in taken:
+                    errors.append({"line": line, "error": "Student ID or Email is already registered"})
+                else:
+                    rows.append(row)
+            inserted = insert_ignore(Participant, rows) if rows else 0
+            imported += inserted
+            skipped += len(rows) - inserted
+            db.session.commit()
+            processed += len(chunk)
+            chunk = []
+            yield {"processed": processed, "total": total}
+
+    yield {
+        "done": True,
+        "imported": imported,
+        "skipped": skipped,
+        "errors": errors
+    }
+
+@api.cli.command('import-participants')
+@click.argument('csv_file', type=click.File('r', encoding='utf-8-sig'))
+def import_participants_command(csv_file):
+    try:
+        for update in import_participants(csv_file):
+            if update.get('done'):
+                for error in update['errors']:
+                    print(f"Line {error['line']}: {error['error']}")
+                print(f"Imported {update['imported']}, skipped {update['skipped']}, {len(update['errors'])} rows with errors")
+            else:
+                print(f"{update['processed']}/{update['total']} participants processed")
+    except BrokenProcessPool:
+        raise click.ClickException("A worker process died; chunks already reported are imported, run the file again")
+
+# Progress is streamed as NDJSON, one line per inserted chunk, ending with the report
+@api.route('/api/participants/import', methods=['POST'])
+def import_participants_upload():
+    upload = request.files.get('file')
+    text_data = upload.read().decode('utf-8-sig') if upload else request.get_data(as_text=True)
+    if not text_data.strip():
+        return jsonify({"error": "Upload a CSV file with columns: " + ', '.join(IMPORT_FIELDS)}), 400
+
+    # The first chunk is hashed before responding, so an unavailable worker pool is answered with 503
+    try:
+        updates = prime_stream(import_participants(io.StringIO(text_data)), 2)
+    except BrokenProcessPool:
+        return jsonify({"error": "The import is temporarily unavailable, please try again."}), 503
+
+    def generate():
+        try:
+            for update in updates:
+                yield json.dumps(update) + '\n'
+        except BrokenProcessPool:
+            # The status line is already sent, so the failure is reported in the stream; committed chunks stay imported
+            yield json.dumps({"done": True, "error": "The import was interrupted, please upload the file again."}) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
 #Event Registration
 
-@app.route('/api/register', methods=['POST'])
+@api.route('/api/register', methods=['POST'])
 def register_participant():
     data = request.json
-    print(f"Incoming registration data: {data}")  # Log incoming data for debugging
 
     # List of required fields with validation
     required_fields = ['student_id', 'fullname', 'year_and_block', 'department', 'event_id']
     for field in required_fields:
         if field not in data or not data[field]:  # Check presence and non-emptiness
             error_message = f"Field '{field}' is missing or invalid."
-            print(f"Validation error: {error_message}")  # Log missing/invalid field
+            log_event('registration_rejected', sampled=True, reason=error_message)
             return jsonify({"error": error_message}), 400
 
         # Specific validation for event_id to allow integers
         if field == 'event_id' and not isinstance(data[field], (str, int)):
             error_message = f"Field '{field}' should be a valid string or integer."
-            print(f"Validation error: {error_message}")
+            log_event('registration_rejected', sampled=True, reason=error_message)
             return jsonify({"error": error_message}), 400
 
         # General validation for string fields
         if field != 'event_id' and not isinstance(data[field], str):
             error_message = f"Field '{field}' should be a valid string."
-            print(f"Validation error: {error_message}")
+            log_event('registration_rejected', sampled=True, reason=error_message)
             return jsonify({"error": error_message}), 400
 
-    # Check if the participant is already registered for the event
-    existing_registration = db.session.query(EventRegistration).filter_by(
-        student_id=data['student_id'], event_id=data['event_id']
-    ).first()
-    
-    if existing_registration:
-        print(f"Duplicate registration attempt for student_id: {data['student_id']}, event_id: {data['event_id']}")
-        return jsonify({"error": "You are already registered for this event."}), 400
-
-    # Create a new registration record
-    new_registration = EventRegistration(
-        student_id=data['student_id'],
-        fullname=data['fullname'],
-        year_and_block=data['year_and_block'],
-        department=data['department'],
-        event_id=data['event_id'],  # The event ID from the frontend
-        registration_date=datetime.utcnow(),  # Real-time registration timestamp
-        registration_status="registered"  # Status defaults to 'registered'
-    )
+    try:
+        event_id = int(data['event_id'])
+        student_id = int(data['student_id'])
+    except ValueError:
+        return jsonify({"error": "Fields 'event_id' and 'student_id' should be numeric."}), 400
+    if not get_cached_event(event_id):
+        return jsonify({"error": "Event not found"}), 404
+    # Archived rows are no longer covered by the unique indexes, so a new row could duplicate one of them
+    if is_archived(event_id):
+        return jsonify({"error": "Event has been archived"}), 409
+
+    first_name, last_name = split_fullname(data['fullname'])
+    new_registration = {
+        "student_id": student_id,
+        "firstName": first_name,
+        "lastName": last_name,
+        "year_and_block": data['year_and_block'],
+        "department": data['department'],
+        "event_id": event_id,  # The event ID from the frontend
+        "registration_date": datetime.utcnow(),  # Real-time registration timestamp
+        "registration_status": "registered"  # Status defaults to 'registered'
+    }
 
     try:
-        # Save the registration in the database
-        db.session.add(new_registration)
+        # Take a seat first; a full event puts the student on the waitlist instead
+        seat = take_seat(event_id)
+        if not seat:
+            new_registration["registration_status"] = "waitlisted"
+
+        # The unique (event_id, student_id) index rejects duplicates in the same statement;
+        # rolling back also returns the seat
+        if not insert_ignore(EventRegistration, [new_registration]):
+            db.session.rollback()
+            log_event('registration_duplicate', sampled=True, event_id=event_id, student_id=student_id)
+            return jsonify({"error": "You are already registered for this event."}), 400
+        if seat:
+            # A walk-in who registers afterwards now counts as a registered check-in
+            increment_event_summary(event_id, registration_count=1,
+                                    registered_check_in_count=checked_in_count(event_id, [student_id]))
+        bump_versions(f"registrations:{event_id}")
         db.session.commit()
-        print(f"Registration successful for student_id: {data['student_id']}, event_id: {data['event_id']}")
-        return jsonify({"message": "Registration successful!"}), 201
+        registration_index.forget(event_id)
+
+        if not seat:
+            log_event('registration_waitlisted', sampled=True, event_id=event_id, student_id=student_id)
+            return jsonify({
+                "message": "The event is full. You have been added to the waitlist.",
+                "registration_status": "waitlisted"
+            }), 202
+        log_event('registration_confirmed', sampled=True, event_id=event_id, student_id=student_id)
+        return jsonify({"message": "Registration successful!", "registration_status": "registered"}), 201
     except Exception as e:
         db.session.rollback()
-        error_details = traceback.format_exc()
-        print(f"Database error during registration: {error_details}")  # Log detailed error for debugging
+        log_event('registration_failed', logging.ERROR, exc_info=True, event_id=event_id, student_id=student_id)
         return jsonify({
             "error": "An unexpected error occurred during registration. Please try again later.",
             "details": str(e)  # Include error details for API clients if needed
         }), 500
 
 
+# Cancelling a registration frees the seat for the next student on the waitlist
+@api.route('/api/register/cancel', methods=['POST'])
+def cancel_registration():
+    data = request.json or {}
+    try:
+        event_id = int(data['event_id'])
+        student_id = int(data['student_id'])
+    except (KeyError, TypeError, ValueError):
+        return jsonify({"error": "Fields 'event_id' and 'student_id' are required."}), 400
+
+    try:
+        registration = EventRegistration.query.filter_by(
+            event_id=event_id, student_id=student_id
+        ).with_for_update().first()
+        if not registration:
+            return jsonify({"error": "Registration not found"}), 404
+
+        was_registered = registration.registration_status == 'registered'
+        db.session.delete(registration)
+        db.session.flush()
+
+        promoted = None
+        if was_registered:
+            # The seat passes straight to the next waitlisted student, or back to the pool
+            promoted = promote_from_waitlist(event_id)
+            counts = {'registered_check_in_count': checked_in_count(
+                event_id, [promoted.student_id] if promoted else []
+            ) - checked_in_count(event_id, [student_id])}
+            if promoted is None:
+                release_seat(event_id)
+                counts['registration_count'] = -1
+            increment_event_summary(event_id, **counts)
+        bump_versions(f"registrations:{event_id}")
+        db.session.commit()
+        registration_index.forget(event_id)
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": "Failed to cancel registration", "details": str(e)}), 500
+
+    return jsonify({
+        "message": "Registration cancelled",
+        "promoted_student_id": promoted.student_id if promoted else None
+    }), 200
+
+
+# Badge export: every confirmed registrant's QR, as a streamed ZIP or a printable sheet
+BADGE_BATCH_SIZE = 200
+BADGES_PER_SHEET = 60
+
+def render_badges(rows):
+    # Uses the stored or cached QR when there is one and renders the rest of each batch across the worker pool
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == BADGE_BATCH_SIZE:
+            yield from render_badge_batch(batch)
+            batch = []
+    if batch:
+        yield from render_badge_batch(batch)
+
+def render_badge_batch(rows):
+    payloads = [participant_qr_payload(row.student_id, row.firstName, row.lastName, row.department) for row in rows]
+    pngs = [row.qr_code or qr_cache.peek(payload) for row, payload in zip(rows, payloads)]
+    missing = [index for index, png in enumerate(pngs) if png is None]
+    if missing:
+        rendered = pool_map(render_qr_png, [payloads[index] for index in missing])
+        for index, (png, seconds) in zip(missing, rendered):
+            qr_render_time.observe(seconds)
+            # Kept on disk only, so a large export does not flush the hot images out of memory
+            qr_cache.store(payloads[index], png, remember=False)
+            pngs[index] = png
+    for row, png in zip(rows, pngs):
+        yield row, png
+
+class StreamSink:
+    # Write-only file object: zipfile writes into it and the response generator drains it after every badge
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+def badge_filename(row):
+    # Names come from user input: only letters, digits and dashes reach the ZIP entry name, so no entry can
+    # point outside the extraction directory or carry control characters
+    parts = [str(row.student_id)] + [
+        re.sub(r'[^A-Za-z0-9]+', '-', name or '').strip('-')[:50] for name in (row.lastName, row.firstName)
+    ]
+    return '_'.join(part for part in parts if part) + '.png'
+
+@api.route('/api/events/<int:event_id>/badges', methods=['GET'])
+def export_event_badges(event_id):
+    event = get_cached_event(event_id)
+    if not event:
+        return jsonify({"error": "Event not found"}), 404
+
+    registrants = db.session.query(
+        EventRegistration.student_id, EventRegistration.firstName, EventRegistration.lastName,
+        EventRegistration.department, Participant.qr_code
+    ).outerjoin(Participant, Participant.student_Id == EventRegistration.student_id).filter(
+        EventRegistration.event_id == event_id, EventRegistration.registration_status == 'registered'
+    ).order_by(EventRegistration.lastName, EventRegistration.firstName, EventRegistration.student_id)
+
+    if request.args.get('format', 'zip') == 'html':
+        page = max(request.args.get('page', 1, type=int), 1)
+        per_page = min(max(request.args.get('per_page', BADGES_PER_SHEET, type=int), 1), 500)
+        rows = registrants.offset((page - 1) * per_page).limit(per_page)
+
+        def generate_sheet():
+            yield (
+                f"<!DOCTYPE html><html><head><meta charset='utf-8'><title>{escape(event.event_name)} badges, page {page}</title>"
+                "<style>body{font-family:sans-serif}.badge{display:inline-block;width:30%;margin:1%;text-align:center;"
+                "page-break-inside:avoid}.badge img{width:100%}</style></head><body>"
+            )
+            for row, png in render_badges(rows):
+                yield (
+                    f"<div class='badge'><img src='data:image/png;base64,{base64.b64encode(png).decode('ascii')}'>"
+                    f"<p>{escape(row.firstName)} {escape(row.lastName)}<br>{row.student_id}</p></div>"
+                )
+            yield "</body></html>"
+
+        try:
+            # The header and the first badge are rendered before responding, so a broken pool gets a 503
+            sheet = prime_stream(generate_sheet(), 2)
+        except BrokenProcessPool:
+            return jsonify({"error": "Badge rendering is temporarily unavailable, please try again."}), 503
+        return Response(stream_with_context(sheet), mimetype='text/html')
+
+    def generate_zip():
+        sink = StreamSink()
+        # PNGs are already compressed, so entries are stored as-is
+        with zipfile.ZipFile(sink, mode='w', compression=zipfile.ZIP_STORED) as archive:
+            for row, png in render_badges(registrants.yield_per(BADGE_BATCH_SIZE)):
+                archive.writestr(badge_filename(row), png)
+                yield sink.drain()
+        yield sink.drain()
+
+    try:
+        # The first badge batch is rendered before responding, so a broken pool gets a 503; a pool breaking later
+        # ends the download early and the client sees an incomplete ZIP
+        badges = prime_stream(generate_zip(), 1)
+    except BrokenProcessPool:
+        return jsonify({"error": "Badge rendering is temporarily unavailable, please try again."}), 503
+    return Response(stream_with_context(badges), mimetype='application/zip', headers={
+        'Content-Disposition': f'attachment; filename="event_{event_id}_badges.zip"'
+    })
+
+
 # Fetching Registered Students
-@app.route('/api/event_registration/<int:event_id>', methods=['GET'])
+@api.route('/api/event_registration/<int:event_id>', methods=['GET'])
+@conditional_response('registrations:{event_id}')
 def get_event_registration(event_id):
     registrations = EventRegistration.query.filter_by(event_id=event_id).all()
+    registrations += archived_records(event_id, 'registrations')
     
-    result = []
-    for reg in registrations:
-        result.append({
-            "student_id": reg.student_id,
-            "firstName": reg.firstName,
-            "lastName": reg.lastName,
-            "year_and_block": reg.year_and_block,
-            "department": reg.department,
-            "registration_date": reg.registration_date.strftime('%Y-%m-%d %H:%M:%S'),
-            "registration_status": reg.registration_status
-        })
-    
+    result = [serialize_registration(reg) for reg in registrations]
+
     # Return an empty list if no registrations exist
     return jsonify({"event_id": event_id, "registrations": result}), 200
 
+def serialize_registration(reg):
+    return {
+        "student_id": reg.student_id,
+        "firstName": reg.firstName,
+        "lastName": reg.lastName,
+        "year_and_block": reg.year_and_block,
+        "department": reg.department,
+        "registration_date": reg.registration_date.strftime('%Y-%m-%d %H:%M:%S'),
+        "registration_status": reg.registration_status
+    }
+
 
 # Fetching Attendance for an Event
-@app.route('/api/event_attendance/<int:event_id>', methods=['GET'])
+@api.route('/api/event_attendance/<int:event_id>', methods=['GET'])
+@conditional_response('attendance:{event_id}')
 def get_event_attendance(event_id):
     attendance_records = Attendance.query.filter_by(event_id=event_id).all()
+    attendance_records += archived_records(event_id, 'attendance')
     
-    result = []
-    for record in attendance_records:
-        result.append({
-            "student_id": record.student_id,
-            "firstName": record.firstName,
-            "lastName": record.lastName,
-            "year_and_block": record.year_and_block,
-            "department": record.department,
-            "check_in": record.check_in.strftime('%Y-%m-%d %H:%M:%S') if record.check_in else None,
-            "check_out": record.check_out.strftime('%Y-%m-%d %H:%M:%S') if record.check_out else None,
-            "status": record.status
-        })
-    
+    result = [serialize_attendance(record) for record in attendance_records]
+
     # Return an empty list if no attendance records exist
     return jsonify({"event_id": event_id, "attendance": result}), 200
 
+def serialize_attendance(record):
+    return {
+        "student_id": record.student_id,
+        "firstName": record.firstName,
+        "lastName": record.lastName,
+        "year_and_block": record.year_and_block,
+        "department": record.department,
+        "check_in": record.check_in.strftime('%Y-%m-%d %H:%M:%S') if record.check_in else None,
+        "check_out": record.check_out.strftime('%Y-%m-%d %H:%M:%S') if record.check_out else None,
+        "status": record.status
+    }
+
+
+# Streaming exports of registrations and attendance
+EXPORT_TABLES = {
+    'registrations': (EventRegistration, ['event_id', 'student_id', 'firstName', 'lastName', 'year_and_block',
+                                          'department', 'registration_date', 'registration_status']),
+    'attendance': (Attendance, ['event_id', 'student_id', 'firstName', 'lastName', 'year_and_block',
+                                'department', 'check_in', 'check_out', 'status']),
+}
+EXPORT_BATCH_SIZE = 1000
+
+def export_rows(rows, columns, fmt):
+    # Rows arrive from a server-side cursor in batches and are written out one batch at a time
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if fmt == 'csv' else None
+    if writer:
+        writer.writerow(columns)
+    for count, row in enumerate(rows, start=1):
+        values = [format_column_value(getattr(row, column)) for column in columns]
+        if writer:
+            writer.writerow(values)
+        else:
+            buffer.write(json.dumps(dict(zip(columns, values))) + '\n')
+        if count % EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+def gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+def export_response(kind, event_filter, filename, archived_ids=()):
+    if kind not in EXPORT_TABLES:
+        return jsonify({"error": f"Unknown export '{kind}'"}), 404
+    fmt = request.args.get('format', 'csv')
+    if fmt not in ('csv', 'ndjson'):
+        return jsonify({"error": "'format' must be 'csv' or 'ndjson'"}), 400
+
+    model, columns = EXPORT_TABLES[kind]
+    query = event_filter(db.session.query(*[getattr(model, column) for column in columns]), model)
+    query = query.order_by(model.event_id, model.student_id)
+
+    rows = query.yield_per(EXPORT_BATCH_SIZE)
+    if archived_ids:
+        # Archived events are merged in the same order, as if their rows were still in the table
+        rows = heapq.merge(rows, archived_rows(archived_ids, kind), key=lambda row: (row.event_id, row.student_id))
+    chunks = export_rows(rows, columns, fmt)
+    headers = {'Content-Disposition': f'attachment; filename="{filename}.{fmt}"'}
+    if request.args.get('compress') == 'gzip':
+        chunks = gzip_chunks(chunks)
+        headers['Content-Encoding'] = 'gzip'
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    return Response(stream_with_context(chunks), mimetype=mimetype, headers=headers)
+
+@api.route('/api/events/<int:event_id>/export/<kind>', methods=['GET'])
+def export_event(event_id, kind):
+    return export_response(
+        kind,
+        lambda query, model: query.filter(model.event_id == event_id),
+        f"event_{event_id}_{kind}",
+        archived_event_ids(ArchivedEvent.event_id == event_id)
+    )
+
+# Whole-semester exports: every event whose date falls in [date_from, date_to]
+@api.route('/api/export/<kind>', methods=['GET'])
+def export_date_range(kind):
+    try:
+        date_from = date.fromisoformat(request.args['date_from'])
+        date_to = date.fromisoformat(request.args['date_to'])
+    except KeyError:
+        return jsonify({"error": "'date_from' and 'date_to' are required"}), 400
+    except ValueError as ve:
+        return jsonify({"error": f"Invalid date format: {ve}"}), 400
+
+    return export_response(
+        kind,
+        lambda query, model: query.join(Event, Event.event_id == model.event_id)
+                                  .filter(Event.event_date.between(date_from, date_to)),
+        f"{kind}_{date_from.isoformat()}_{date_to.isoformat()}",
+        archived_event_ids(Event.event_date.between(date_from, date_to))
+    )
+
+
+@api.cli.command('archive-events')
+@click.option('--days', type=click.IntRange(min=0), default=ARCHIVE_RETENTION_DAYS,
+              help='Archive events that took place more than this many days ago.')
+def archive_events_command(days):
+    archived = 0
+    for event_id, (registrations, attendance) in archive_events(days):
+        archived += 1
+        registration_index.forget(event_id)
+        print(f"Event {event_id}: archived {registrations} registrations and {attendance} attendance rows")
+    print(f"Archived {archived} events to {ARCHIVE_DIR}")
+
 
 # ATTENDANCE
-@app.route('/api/attendance', methods=['POST'])
+@api.route('/api/attendance', methods=['POST'])
 def record_attendance():
-    data = request.json
+    # Badge scans send the signed QR text; it is verified and checked against the registrations in memory.
+    # The same validation as the batch endpoint runs first, because INSERT IGNORE would silently drop or
+    # truncate a row that violates a constraint
+    if attendance_journal is not None:
+        # Write-behind mode: acknowledge once the scan is in the local journal, without reading the database
+        fields, error = precheck_scan(request.json)
+        if error:
+            return jsonify({'error': error[1]}), error[0]
+        keys = queue_scans([(0, *fields)], {0: request.headers.get('Idempotency-Key')})
+        return jsonify({'message': 'Scan queued', 'scan_id': keys[0]}), 202
+
+    fields, error = validate_scan(request.json)
+    if error:
+        return jsonify({'error': error[1]}), error[0]
+    event_id, student_id, scanned_at, data = fields
+
+    first_name, last_name = scan_names(data)
+    new_attendance = {
+        'event_id': event_id,
+        'student_id': student_id,
+        'firstName': first_name,
+        'lastName': last_name,
+        'year_and_block': data['year_and_block'],  # Ensure this is passed as a string
+        'department': data['department'],
+        'check_in': scanned_at,
+        'check_out': None,  # Set check_out to None for the first scan
+        'status': data.get('status', 'Absent')  # Default to 'Absent' if not provided
+    }
+    try:
+        # First scan: the insert succeeds; otherwise the unique index already holds this student's row
+        inserted = insert_ignore(Attendance, [new_attendance])
+        if inserted:
+            registered = student_id in registration_index.registered(event_id)
+            increment_event_summary(event_id, check_in_count=1, registered_check_in_count=int(registered))
+            bump_versions(f"attendance:{event_id}")
+            db.session.commit()
+            publish_attendance(event_id, [check_in_delta(new_attendance)])
+            return jsonify({'message': 'Check-in recorded successfully'}), 201
+
+        # Second scan: close the row only if it is still open
+        checked_out = Attendance.query.filter_by(
+            event_id=event_id,
+            student_id=student_id,
+            check_out=None
+        ).update({'check_out': scanned_at}, synchronize_session=False)
+        if checked_out:
+            increment_event_summary(event_id, check_out_count=1)
+            bump_versions(f"attendance:{event_id}")
+        db.session.commit()
+        if checked_out:
+            publish_attendance(event_id, [check_out_delta(student_id, scanned_at)])
+            return jsonify({'message': 'Check-out recorded successfully'}), 200
+        return jsonify({'error': 'Attendance already completed'}), 409
+
+    except Exception:
+        db.session.rollback()
+        log_event('attendance_failed', logging.ERROR, exc_info=True, event_id=event_id, student_id=student_id)
+        return jsonify({'error': 'Failed to record attendance'}), 500
 
-    # Validate required fields
-    required_fields = ['event_id', 'student_id', 'fullname', 'year_and_block', 'department']
-    if not all(field in data for field in required_fields):
-        return jsonify({'error': 'Missing required fields'}), 400
 
+# BULK ATTENDANCE (scanner bursts / offline backlog)
+MAX_BATCH_SCANS = 1000
+SCAN_FIELDS = ['event_id', 'student_id', 'fullname', 'year_and_block', 'department']
+
+# Attendance text columns filled from a scan, and whether the scan has to provide them
+SCAN_TEXT_COLUMNS = {'firstName': False, 'lastName': False, 'year_and_block': True, 'department': True,
+                     'status': False}
+
+def scan_field_error(scan):
+    # INSERT IGNORE turns constraint violations into warnings (MySQL truncates the value or stores a default),
+    # so anything the attendance columns would not store as sent is rejected up front
+    if 'firstName' not in scan and not isinstance(scan['fullname'], str):
+        return "'fullname' must be a string"
+    first_name, last_name = scan_names(scan)
+    values = dict(scan, firstName=first_name, lastName=last_name)
+    for column, required in SCAN_TEXT_COLUMNS.items():
+        value = values.get(column)
+        if value is None and not required:
+            continue
+        if not isinstance(value, str) or (required and not value.strip()):
+            return f"'{column}' must be a non-empty string" if required else f"'{column}' must be a string"
+        length = Attendance.__table__.c[column].type.length
+        if len(value) > length:
+            return f"'{column}' may be at most {length} characters"
+    return None
+
+def scan_fields(scan):
+    # The checks a plain scan passes without the database; same return value as validate_scan
+    if not isinstance(scan, dict) or not all(field in scan for field in SCAN_FIELDS):
+        return None, (400, 'Missing required fields')
     try:
-        # Check for existing attendance record
-        existing_attendance = Attendance.query.filter_by(
-            event_id=data['event_id'],
-            student_id=data['student_id']
-        ).first()
-
-        if existing_attendance:
-            # Update the check_out field if it is the second scan
-            if existing_attendance.check_out is None:
-                existing_attendance.check_out = datetime.utcnow().strftime('%m-%d-%Y %H:%M:%S')
-                db.session.commit()
-                return jsonify({'message': 'Check-out recorded successfully'}), 200
+        fields = (int(scan['event_id']), int(scan['student_id']), parse_scan_time(scan.get('scanned_at')), scan)
+    except (TypeError, ValueError):
+        return None, (400, 'Invalid event_id, student_id or scanned_at')
+    error = scan_field_error(scan)
+    if error:
+        return None, (400, error)
+    return fields, None
+
+def precheck_scan(scan):
+    # Write-behind mode journals a scan after the checks that need no database: the badge signature or the
+    # scan's fields. The flusher runs validate_scan on it, so the registration and the event are checked there
+    if not (isinstance(scan, dict) and 'qr' in scan):
+        return scan_fields(scan)
+    badge = verify_participant_qr(scan.get('qr'))
+    if badge is None:
+        return None, (403, 'Invalid QR code')
+    try:
+        event_id = int(scan.get('event_id'))
+    except (TypeError, ValueError):
+        return None, (403, 'Invalid event_id')
+    try:
+        scanned_at = parse_scan_time(scan.get('scanned_at'))
+    except (TypeError, ValueError):
+        return None, (400, 'Invalid scanned_at')
+    return (event_id, badge[0], scanned_at, scan), None
+
+def validate_scan(scan):
+    # Returns ((event_id, student_id, scanned_at, scan), None) or (None, (code, error))
+    if isinstance(scan, dict) and 'qr' in scan:
+        scan, error = resolve_qr_scan(scan)
+        if error:
+            return None, (403, error)
+    fields, error = scan_fields(scan)
+    if error:
+        return None, error
+    if get_cached_event(fields[0]) is None:
+        return None, (404, 'Event not found')
+    # An archived event's attendance lives in its column file, out of reach of the unique index
+    if is_archived(fields[0]):
+        return None, (409, 'Event has been archived')
+    return fields, None
+
+APPLY_SCAN_ATTEMPTS = 3
+
+def apply_scans(valid_scans, scan_keys=None, attempts=APPLY_SCAN_ATTEMPTS):
+    # Record (index, event_id, student_id, scanned_at, scan) tuples in one transaction and publish the deltas.
+    # With scan_keys ({index: idempotency key}) scans whose key was already applied are skipped, and the new
+    # keys are stored in the same transaction, so replaying a batch never counts a scan twice.
+    batch = valid_scans
+    results = {}
+    if scan_keys:
+        applied = {key for (key,) in db.session.query(AppliedScan.scan_key)
+                   .filter(AppliedScan.scan_key.in_(set(scan_keys.values())))}
+        fresh = []
+        for scan in valid_scans:
+            if scan_keys[scan[0]] in applied:
+                results[scan[0]] = {'index': scan[0], 'code': 208, 'message': 'Scan already applied'}
             else:
-                return jsonify({'error': 'Attendance already completed'}), 409
-
-        # Add new attendance record
-        new_attendance = Attendance(
-            event_id=data['event_id'],
-            student_id=data['student_id'],
-            fullName=data['fullname'], 
-            year_and_block=data['year_and_block'],  # Ensure this is passed as a string
-            department=data['department'],
-            check_in=data.get('check_in', datetime.utcnow().strftime('%m-%d-%Y %H:%M:%S')),  # Use formatted current time if missing
-            check_out=None,  # Set check_out to None for the first scan
-            status=data.get('status', 'Absent')  # Default to 'Absent' if not provided
-        )
-        db.session.add(new_attendance)
+                applied.add(scan_keys[scan[0]])
+                fresh.append(scan)
+        valid_scans = fresh
+
+    # One query for every attendance row this batch touches
+    pairs = {(event_id, student_id) for _, event_id, student_id, _, _ in valid_scans}
+    existing = {}
+    if pairs:
+        rows = Attendance.query.filter(tuple_(Attendance.event_id, Attendance.student_id).in_(pairs)).all()
+        existing = {(row.event_id, row.student_id): row for row in rows}
+
+    # Resolve check-in versus check-out in scan order, including repeated scans within the batch
+    new_rows = {}
+    summary_counts = defaultdict(lambda: {'check_in_count': 0, 'check_out_count': 0, 'registered_check_in_count': 0})
+    deltas = defaultdict(list)
+    for index, event_id, student_id, scanned_at, scan in valid_scans:
+        key = (event_id, student_id)
+        result = {'index': index, 'event_id': event_id, 'student_id': student_id}
+        record = existing.get(key)
+        pending = new_rows.get(key)
+
+        if record is None and pending is None:
+            first_name, last_name = scan_names(scan)
+            new_rows[key] = {
+                'event_id': event_id,
+                'student_id': student_id,
+                'firstName': first_name,
+                'lastName': last_name,
+                'year_and_block': scan['year_and_block'],
+                'department': scan['department'],
+                'check_in': scanned_at,
+                'check_out': None,
+                'status': scan.get('status', 'Absent')
+            }
+            summary_counts[event_id]['check_in_count'] += 1
+            deltas[event_id].append(check_in_delta(new_rows[key]))
+            result.update({'code': 201, 'message': 'Check-in recorded successfully'})
+        elif record is not None and record.check_out is None:
+            record.check_out = scanned_at
+            summary_counts[event_id]['check_out_count'] += 1
+            deltas[event_id].append(check_out_delta(student_id, scanned_at))
+            result.update({'code': 200, 'message': 'Check-out recorded successfully'})
+        elif pending is not None and pending['check_out'] is None:
+            pending['check_out'] = scanned_at
+            summary_counts[event_id]['check_out_count'] += 1
+            deltas[event_id].append(check_out_delta(student_id, scanned_at))
+            result.update({'code': 200, 'message': 'Check-out recorded successfully'})
+        else:
+            result.update({'code': 409, 'error': 'Attendance already completed'})
+        results[index] = result
+
+    # One query tells which of the new check-ins hold a confirmed registration
+    if new_rows:
+        for event_id, _ in db.session.query(EventRegistration.event_id, EventRegistration.student_id).filter(
+            tuple_(EventRegistration.event_id, EventRegistration.student_id).in_(list(new_rows)),
+            EventRegistration.registration_status == 'registered'
+        ):
+            summary_counts[event_id]['registered_check_in_count'] += 1
+
+    try:
+        # Inserts go out as a single executemany, updates are flushed with the same commit
+        if new_rows and insert_ignore(Attendance, list(new_rows.values())) != len(new_rows):
+            # Another scanner inserted some of these rows after they were read, and the unique index skipped
+            # ours: start over so those scans resolve against the committed rows instead of reporting a 201
+            db.session.rollback()
+            if attempts <= 1:
+                raise RuntimeError('Attendance rows kept changing while the scans were applied')
+            log_event('attendance_batch_retry', logging.WARNING, scans=len(batch))
+            return apply_scans(batch, scan_keys, attempts - 1)
+        for event_id, counts in summary_counts.items():
+            increment_event_summary(event_id, **counts)
+            bump_versions(f"attendance:{event_id}")
+        if scan_keys and valid_scans:
+            applied_at = datetime.utcnow()
+            insert_ignore(AppliedScan, [
+                {'scan_key': scan_keys[scan[0]], 'applied_at': applied_at} for scan in valid_scans
+            ])
         db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
 
-        return jsonify({'message': 'Check-in recorded successfully'}), 201
+    for event_id, messages in deltas.items():
+        publish_attendance(event_id, messages)
+    return results
 
-    except Exception as e:
-        print(f"Error: {e}")
-        print("Received data:", data)
-        return jsonify({'error': 'Failed to record attendance'}), 500
+@api.route('/api/attendance/batch', methods=['POST'])
+def record_attendance_batch():
+    data = request.json
+    scans = data.get('scans') if isinstance(data, dict) else data
+    if not isinstance(scans, list) or not scans:
+        return jsonify({'error': "'scans' must be a non-empty list"}), 400
+    if len(scans) > MAX_BATCH_SCANS:
+        return jsonify({'error': f"A batch may contain at most {MAX_BATCH_SCANS} scans"}), 400
+
+    results = [None] * len(scans)
+    valid_scans = []
+    # Write-behind mode only runs the checks that need no database; the flusher validates the rest
+    check = precheck_scan if attendance_journal is not None else validate_scan
+    for index, scan in enumerate(scans):
+        fields, error = check(scan)
+        if error:
+            results[index] = {'index': index, 'code': error[0], 'error': error[1]}
+            continue
+        valid_scans.append((index, *fields))
+
+    if attendance_journal is not None:
+        # Write-behind mode: the scans are durable once journaled, the flusher records them shortly after
+        keys = queue_scans(valid_scans)
+        for index, key in keys.items():
+            results[index] = {'index': index, 'code': 202, 'scan_id': key, 'message': 'Scan queued'}
+        return jsonify({'queued': len(keys), 'rejected': len(scans) - len(keys), 'results': results}), 202
+
+    try:
+        for index, result in apply_scans(valid_scans).items():
+            results[index] = result
+    except Exception:
+        log_event('attendance_batch_failed', logging.ERROR, exc_info=True, scans=len(valid_scans))
+        return jsonify({'error': 'Failed to record attendance batch'}), 500
+
+    checked_in = sum(1 for result in results if result['code'] == 201)
+    checked_out = sum(1 for result in results if result['code'] == 200)
+    return jsonify({
+        'checked_in': checked_in,
+        'checked_out': checked_out,
+        'rejected': len(scans) - checked_in - checked_out,
+        'results': results
+    }), 200
+
+
+# WRITE-BEHIND ATTENDANCE (journal and flusher thread in journal.py)
+def queue_scans(valid_scans, client_keys=None):
+    # Journal prechecked scans with their resolved scan time; returns {index: idempotency key}.
+    # A badge scan keeps its signed QR text, which the flusher resolves against the registrations
+    client_keys = client_keys or {}
+    keys = {}
+    entries = []
+    for index, event_id, student_id, scanned_at, scan in valid_scans:
+        key = scan_idempotency_key(event_id, student_id, scanned_at, client_keys.get(index) or scan.get('scan_id'))
+        entry = dict(scan, event_id=event_id, student_id=student_id, scanned_at=scanned_at.isoformat())
+        entries.append((key, entry))
+        keys[index] = key
+    if entries:
+        attendance_journal.append(entries)
+        attendance_flusher.start()
+        attendance_flusher.notify()
+    return keys
+
+def flush_attendance_journal(journal, limit):
+    # Apply the oldest queued scans; they leave the journal only after their transaction committed.
+    # A database error while validating or applying leaves every scan queued for the next attempt
+    entries = journal.pending(limit)
+    if not entries:
+        return 0
+    valid_scans = []
+    scan_keys = {}
+    for seq, key, scan in entries:
+        fields, error = validate_scan(scan)
+        if error:
+            log_event('journal_scan_dropped', logging.WARNING, scan_id=key, reason=error[1])
+            continue
+        valid_scans.append((seq, *fields))
+        scan_keys[seq] = key
+    apply_scans(valid_scans, scan_keys)
+    journal.remove([seq for seq, _, _ in entries])
+    return len(entries)
+
+attendance_flusher = AttendanceFlusher(attendance_journal, flush_attendance_journal)
+os.register_at_fork(after_in_child=attendance_flusher.reset)
+
+@api.before_app_request
+def start_attendance_flusher():
+    # Scans left in the journal by a restarted server are picked up without waiting for a new scan
+    if attendance_journal is not None:
+        attendance_flusher.start()
+
+@api.cli.command('flush-attendance')
+def flush_attendance_command():
+    if attendance_journal is None:
+        print("ATTENDANCE_JOURNAL_PATH is not set")
+        return
+    if not attendance_journal.acquire_lease(f"cli:{os.getpid()}"):
+        print("A server process is flushing the journal; try again once it is stopped")
+        return
+    applied = 0
+    while True:
+        flushed = flush_attendance_journal(attendance_journal, JOURNAL_FLUSH_BATCH)
+        applied += flushed
+        if flushed < JOURNAL_FLUSH_BATCH:
+            break
+    print(f"Applied {applied} journaled scans")
+
+@api.route('/api/attendance/queue', methods=['GET'])
+def get_attendance_queue():
+    if attendance_journal is None:
+        return jsonify({'enabled': False}), 200
+    return jsonify(dict(attendance_journal.stats(), enabled=True, last_error=attendance_flusher.last_error)), 200
+
+
+# LIVE ATTENDANCE FEED (Server-Sent Events, published through feed.py)
+# Each open stream holds a server thread: streams end after FEED_STREAM_LIFETIME seconds (the browser reconnects
+# and resumes with Last-Event-ID) and at most FEED_MAX_STREAMS are open per process, leaving threads for requests
+FEED_STREAM_LIFETIME = int(os.environ.get('FEED_STREAM_LIFETIME', 300))
+FEED_MAX_STREAMS = int(os.environ.get('FEED_MAX_STREAMS', 4))
+feed_streams = threading.BoundedSemaphore(FEED_MAX_STREAMS)
+
+@api.route('/api/events/<int:event_id>/attendance/stream', methods=['GET'])
+def stream_attendance(event_id):
+    # Clients resume with Last-Event-ID (sent by EventSource on reconnect) or ?since=<seq> from the dashboard
+    since = request.headers.get('Last-Event-ID') or request.args.get('since')
+    try:
+        since = int(since) if since is not None else attendance_feed.latest(event_id)
+    except ValueError:
+        return jsonify({"error": "Invalid sequence number"}), 400
+    if not feed_streams.acquire(blocking=False):
+        log_event('attendance_stream_rejected', logging.WARNING, event_id=event_id)
+        response = jsonify({"error": "Too many open attendance streams, try again shortly"})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+
+    def generate():
+        after = since
+        deadline = time.monotonic() + FEED_STREAM_LIFETIME
+        yield "retry: 3000\n\n"
+        latest = attendance_feed.latest(event_id)
+        if after > latest:
+            # The feed restarted since this client last connected
+            yield sse_message('reset', latest, {'seq': latest})
+            after = latest
+        while time.monotonic() < deadline:
+            messages = attendance_feed.read(event_id, after, min(FEED_KEEPALIVE, max(deadline - time.monotonic(), 0)))
+            if not messages:
+                yield ": keep-alive\n\n"
+                continue
+            if messages[0][0] > after + 1:
+                # Some deltas already fell out of the history; the client has to reload the dashboard
+                yield sse_message('reset', messages[0][0] - 1, {'seq': messages[0][0] - 1})
+            for seq, message in messages:
+                yield sse_message('attendance', seq, message)
+                after = seq
+        # An id-only block sets the client's Last-Event-ID without dispatching an event, so the reconnect
+        # resumes here even if nothing was sent on this stream
+        yield f"id: {after}\n\n"
+
+    response = Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+    # Runs however the stream ends, including a client that disconnects before the first message
+    response.call_on_close(feed_streams.release)
+    return response
 
 
 #qr generation
-@app.route('/api/events/<int:event_id>/generate-qr', methods=['GET'])
+@api.route('/api/events/<int:event_id>/generate-qr', methods=['GET'])
 def generate_qr_code(event_id):
-    # Fetch event data from the database
-    event = Event.query.get(event_id)
+    # Fetch event data through the event cache
+    event = get_cached_event(event_id)
     if not event:
         return jsonify({"error": "Event not found"}), 404
 
-    # Prepare QR code data
-    qr_data = f"{event.event_id},{event.event_name},{event.location}"
-    qr = qrcode.make(qr_data)
-    
-    # Convert QR code to Base64
-    buffer = io.BytesIO()
-    qr.save(buffer, format="PNG")
-    qr_code_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
+    # Rendered once per payload, then served from memory or disk
+    key, png = qr_cache.get(event_qr_payload(event))
+    qr_code_base64 = base64.b64encode(png).decode('utf-8')
 
-    return jsonify({
+    response = jsonify({
         "qr_code": qr_code_base64,
         "event_name": event.event_name
     })
+    response.set_etag(key)
+    return response.make_conditional(request)
+
+# Raw PNG for projector and kiosk screens that poll the QR
+@api.route('/api/events/<int:event_id>/qr.png', methods=['GET'])
+def get_event_qr_image(event_id):
+    event = get_cached_event(event_id)
+    if not event:
+        return jsonify({"error": "Event not found"}), 404
+
+    key, png = qr_cache.get(event_qr_payload(event))
+    return png_response(key, png)
+
+
+# Cache statistics
+@api.route('/api/cache/stats', methods=['GET'])
+def get_cache_stats():
+    return jsonify({"event_cache": event_cache.stats()}), 200
+
+
+# Prometheus scrape endpoint; each server process reports its own numbers
+@api.route('/metrics', methods=['GET'])
+def get_metrics():
+    lines = [line for metric in METRICS for line in metric.render()]
+    lines.extend(pool_gauges(db.engine.pool))
+    return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
 
 
 #report generation event fetching
-@app.route('/api/events', methods=['GET'])
+@api.route('/api/reports/events', methods=['GET'])
 def get_events():
-    current_date = datetime.now().date()
-    all_events = Event.query.all()
-    
+    # Status is decided by the database so the totals can be grouped in SQL
+    status = case((Event.event_date >= func.current_date(), 'Upcoming'), else_='Completed')
+    totals = dict(db.session.query(status, func.count(Event.event_id)).group_by(status).all())
+
+    # Per-event counters come precomputed from the summary table
+    rows = db.session.query(
+        Event.event_id, Event.event_name, Event.location, Event.event_date, status,
+        EventSummary.registration_count, EventSummary.check_in_count, EventSummary.check_out_count,
+        EventSummary.registered_check_in_count
+    ).outerjoin(EventSummary, EventSummary.event_id == Event.event_id).order_by(Event.event_date, Event.event_id)
+
     events_list = []
-    scheduled_events = 0
-    completed_events = 0
-
-    for event in all_events:
-        event_data = {
-            "id": event.id,
-            "event_name": event.event_name,
-            "location": event.location,
-            "event_date": event.event_date.strftime("%Y-%m-%d"),
-        }
-        if event.event_date >= current_date:
-            event_data["status"] = "Upcoming"
-            scheduled_events += 1
-        else:
-            event_data["status"] = "Completed"
-            completed_events += 1
-        
-        events_list.append(event_data)
+    for (event_id, event_name, location, event_date, event_status, registrations, check_ins, check_outs,
+         registered_check_ins) in rows:
+        events_list.append({
+            "id": event_id,
+            "event_id": event_id,
+            "event_name": event_name,
+            "location": location,
+            "event_date": event_date.strftime("%Y-%m-%d") if event_date else None,
+            "status": event_status,
+            "registration_count": registrations or 0,
+            "check_in_count": check_ins or 0,
+            "check_out_count": check_outs or 0,
+            "registered_check_in_count": registered_check_ins or 0,
+            # Walk-ins are left out so the rate matches the dashboard and never exceeds 1
+            "attendance_rate": attendance_rate(registrations or 0, registered_check_ins or 0)
+        })
 
     response = {
-        "total_events": len(events_list),
-        "scheduled_events": scheduled_events,
-        "completed_events": completed_events,
+        "total_events": sum(totals.values()),
+        "scheduled_events": totals.get('Upcoming', 0),
+        "completed_events": totals.get('Completed', 0),
         "events": events_list
     }
     return jsonify(response)
 
 
+# Attendance analytics per department and year/block over a range of events
+ANALYTICS_CACHE_TTL = 3600  # seconds; a write changes the data version, so stale entries are never served
+analytics_cache = make_cache_backend(os.environ.get('ANALYTICS_CACHE_URL', 'memory://'), 256)
+
+def data_version():
+    # Every write bumps at least one counter and counters only go up, so the sum changes with any write
+    return db.session.query(func.coalesce(func.sum(DataVersion.version), 0)).scalar()
+
+def summarize_attendance(totals):
+    registered, attended, seconds_total, seconds_count = totals
+    return {
+        "registered": registered,
+        "attended": attended,
+        "no_shows": registered - attended,
+        "attendance_rate": attendance_rate(registered, attended),
+        "no_show_rate": round((registered - attended) / registered, 4) if registered else 0.0,
+        "avg_minutes_on_site": round(seconds_total / seconds_count / 60, 1) if seconds_count else None
+    }
+
+def attendance_analytics(date_from, date_to):
+    in_range = Event.event_date.between(date_from, date_to)
+    groups = [tuple(row) for row in analytics_groups(in_range)]
+    # Archived events contribute the per-group totals stored when they were archived
+    for (analytics,) in db.session.query(ArchivedEvent.analytics).join(
+        Event, Event.event_id == ArchivedEvent.event_id
+    ).filter(in_range):
+        groups.extend(tuple(group) for group in json.loads(analytics))
+
+    by_group = defaultdict(lambda: [0, 0, 0.0, 0])
+    by_department = defaultdict(lambda: [0, 0, 0.0, 0])
+    by_year_and_block = defaultdict(lambda: [0, 0, 0.0, 0])
+    overall = [0, 0, 0.0, 0]
+    for department, year_and_block, registered, attended, seconds_total, seconds_count in groups:
+        totals = (registered, attended, float(seconds_total or 0), seconds_count)
+        for rollup in (by_group[(department, year_and_block)], by_department[department],
+                       by_year_and_block[year_and_block], overall):
+            for i, value in enumerate(totals):
+                rollup[i] += value
+
+    return {
+        "date_from": date_from.isoformat(),
+        "date_to": date_to.isoformat(),
+        "overall": summarize_attendance(overall),
+        "by_department": [
+            dict(summarize_attendance(totals), department=department)
+            for department, totals in sorted(by_department.items())
+        ],
+        "by_year_and_block": [
+            dict(summarize_attendance(totals), year_and_block=year_and_block)
+            for year_and_block, totals in sorted(by_year_and_block.items())
+        ],
+        "by_department_and_year_and_block": [
+            dict(summarize_attendance(totals), department=department, year_and_block=year_and_block)
+            for (department, year_and_block), totals in sorted(by_group.items())
+        ]
+    }
+
+@api.route('/api/reports/attendance-analytics', methods=['GET'])
+def get_attendance_analytics():
+    try:
+        date_from = date.fromisoformat(request.args['date_from'])
+        date_to = date.fromisoformat(request.args['date_to'])
+    except KeyError:
+        return jsonify({"error": "'date_from' and 'date_to' are required"}), 400
+    except ValueError as ve:
+        return jsonify({"error": f"Invalid date format: {ve}"}), 400
+
+    key = f"analytics:{date_from.isoformat()}:{date_to.isoformat()}:{data_version()}"
+    result = analytics_cache.get(key)
+    if result is None:
+        result = attendance_analytics(date_from, date_to)
+        analytics_cache.set(key, result, ANALYTICS_CACHE_TTL)
+    return jsonify(result), 200
+
+# The development server runs in debug mode unless FLASK_DEBUG=0. Under `python app.py` the worker pool's processes
+# re-run this file as __mp_main__; they only need the credentials module, so no app is built there
+if __name__ != '__mp_main__':
+    app = create_app({'DEBUG': env_flag('FLASK_DEBUG', 'true')} if __name__ == '__main__' else None)
+
+# Development server only; production runs several workers with gunicorn (see gunicorn.conf.py)
 if __name__ == '__main__':
     with app.app_context():
         db.create_all()
-    app.run(debug=True)
+        migrate_schema()
+    app.run(debug=app.debug, threaded=True, port=int(os.environ.get('PORT', 5000)))
@@ -0,0 +1,143 @@
+# Archive of completed events: once an event is older than ARCHIVE_RETENTION_DAYS its registration and attendance
+# rows move out of the database into one column file per event and table. A file is a JSON header followed by one
+# zlib-compressed block per column, so readers map it and decompress only the columns they need.
+import json
+import mmap
+import os
+import struct
+import zlib
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+
+from cache import get_cached_event
+from models import ArchivedEvent, Attendance, Event, EventRegistration, analytics_groups, bump_versions, db
+
+ARCHIVE_DIR = os.environ.get('ARCHIVE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'archive'))
+ARCHIVE_RETENTION_DAYS = int(os.environ.get('ARCHIVE_RETENTION_DAYS', 365))
+ARCHIVE_MAGIC = b'EASYCOL1'
+ARCHIVE_TABLES = {'registrations': EventRegistration, 'attendance': Attendance}
+
+def archive_path(event_id, kind):
+    return os.path.join(ARCHIVE_DIR, f"event_{event_id}.{kind}.col")
+
+def write_column_file(path, model, columns, rows):
+    # rows are tuples in `columns` order; the file replaces any earlier attempt only once it is fully on disk
+    blocks = []
+    header_columns = []
+    offset = 0
+    for position, name in enumerate(columns):
+        is_datetime = isinstance(model.__table__.c[name].type, db.DateTime)
+        values = [row[position].isoformat() if is_datetime and row[position] else row[position] for row in rows]
+        block = zlib.compress(json.dumps(values).encode('utf-8'), 6)
+        header_columns.append({'name': name, 'type': 'datetime' if is_datetime else 'json',
+                               'offset': offset, 'length': len(block)})
+        blocks.append(block)
+        offset += len(block)
+    header = json.dumps({'rows': len(rows), 'columns': header_columns}).encode('utf-8')
+
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(ARCHIVE_MAGIC)
+        f.write(struct.pack('<I', len(header)))
+        f.write(header)
+        for block in blocks:
+            f.write(block)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+class ColumnFile:
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(ARCHIVE_MAGIC)] != ARCHIVE_MAGIC:
+            self._map.close()
+            raise ValueError(f"{path} is not an archive column file")
+        (header_length,) = struct.unpack_from('<I', self._map, len(ARCHIVE_MAGIC))
+        header_start = len(ARCHIVE_MAGIC) + 4
+        header = json.loads(self._map[header_start:header_start + header_length])
+        self.row_count = header['rows']
+        self._columns = {column['name']: column for column in header['columns']}
+        self._data_start = header_start + header_length
+
+    def column(self, name):
+        meta = self._columns[name]
+        start = self._data_start + meta['offset']
+        values = json.loads(zlib.decompress(self._map[start:start + meta['length']]))
+        if meta['type'] == 'datetime':
+            values = [datetime.fromisoformat(value) if value else None for value in values]
+        return values
+
+    def rows(self, names):
+        return zip(*(self.column(name) for name in names))
+
+    def close(self):
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def archived_rows(event_ids, kind):
+    # Archived rows of the given events, in (event_id, student_id) order when event_ids is sorted
+    names = [column.name for column in ARCHIVE_TABLES[kind].__table__.columns]
+    for event_id in event_ids:
+        with ColumnFile(archive_path(event_id, kind)) as archive:
+            for values in archive.rows(names):
+                yield SimpleNamespace(**dict(zip(names, values)))
+
+def archived_event_ids(condition):
+    return [event_id for (event_id,) in db.session.query(ArchivedEvent.event_id)
+            .join(Event, Event.event_id == ArchivedEvent.event_id).filter(condition).order_by(ArchivedEvent.event_id)]
+
+def is_archived(event_id):
+    # Only past events are ever archived, so current and upcoming events skip the lookup
+    event = get_cached_event(event_id)
+    if event is None or event.event_date is None or event.event_date >= date.today():
+        return False
+    return ArchivedEvent.query.get(event_id) is not None
+
+def archived_records(event_id, kind):
+    return list(archived_rows([event_id], kind)) if is_archived(event_id) else []
+
+def archive_event(event_id):
+    # Files are written first and the rows deleted in the same transaction that records the archive,
+    # so a failure at any point leaves the event readable from exactly one place
+    archived = {}
+    for kind, model in ARCHIVE_TABLES.items():
+        columns = [column.name for column in model.__table__.columns]
+        rows = db.session.query(*[model.__table__.c[name] for name in columns]).filter(
+            model.event_id == event_id
+        ).order_by(model.student_id).all()
+        write_column_file(archive_path(event_id, kind), model, columns, rows)
+        archived[kind] = rows
+
+    analytics = [
+        [department, year_and_block, registered, attended, float(seconds_total or 0), seconds_count]
+        for department, year_and_block, registered, attended, seconds_total, seconds_count
+        in analytics_groups(EventRegistration.event_id == event_id)
+    ]
+    db.session.add(ArchivedEvent(
+        event_id=event_id,
+        archived_at=datetime.utcnow(),
+        registration_count=sum(1 for row in archived['registrations'] if row.registration_status == 'registered'),
+        check_in_count=sum(1 for row in archived['attendance'] if row.check_in is not None),
+        check_out_count=sum(1 for row in archived['attendance'] if row.check_out is not None),
+        analytics=json.dumps(analytics)
+    ))
+    for model in ARCHIVE_TABLES.values():
+        model.query.filter_by(event_id=event_id).delete(synchronize_session=False)
+    bump_versions(f"registrations:{event_id}", f"attendance:{event_id}")
+    db.session.commit()
+    return len(archived['registrations']), len(archived['attendance'])
+
+def archive_events(retention_days):
+    cutoff = date.today() - timedelta(days=retention_days)
+    event_ids = [event_id for (event_id,) in db.session.query(Event.event_id).outerjoin(
+        ArchivedEvent, ArchivedEvent.event_id == Event.event_id
+    ).filter(Event.event_date < cutoff, ArchivedEvent.event_id.is_(None)).order_by(Event.event_date, Event.event_id)]
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    for event_id in event_ids:
+        yield event_id, archive_event(event_id)
@@ -0,0 +1,400 @@
+# Load and latency benchmark for the API in app.py, run from src/lib:
+#   python benchmark.py --participants 100000 --events 5000 --attendance 1000000 \
+#       --concurrency 1,8,32 --requests 500 --output benchmarks/sqlite-100k.json
+#   python benchmark.py ... --compare benchmarks/sqlite-100k.json
+#
+# Requests go through Flask's test client inside this process, so SQL statements can be counted per request;
+# the seeded database is the same for the same sizes and --seed, and every flow uses its own key range,
+# so two runs issue the same requests in the same order.
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from sqlalchemy import text
+from werkzeug.security import generate_password_hash
+
+BENCH_PASSWORD = 'benchmark-password'
+SEED_CHUNK_SIZE = 10000
+DEPARTMENTS = ['CCS', 'CBA', 'CTE', 'CAS', 'CCJE', 'CON', 'COE']
+FIRST_NAMES = ['Ana', 'Ben', 'Carla', 'Dan', 'Ella', 'Felix', 'Gina', 'Hugo', 'Ivy', 'Jon']
+LAST_NAMES = ['Santos', 'Reyes', 'Cruz', 'Bautista', 'Garcia', 'Mendoza', 'Torres', 'Flores']
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Seed a database and measure the API under concurrent load.')
+    parser.add_argument('--database', default='sqlite:///benchmark.db',
+                        help="SQLAlchemy URI; SQLite files are seeded once per size and copied for each run")
+    parser.add_argument('--participants', type=int, default=100000)
+    parser.add_argument('--events', type=int, default=5000)
+    parser.add_argument('--registrations', type=int, default=500000)
+    parser.add_argument('--attendance', type=int, default=1000000)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--concurrency', default='1,8,32', help='comma-separated thread counts')
+    parser.add_argument('--requests', type=int, default=200, help='requests per flow and concurrency level')
+    parser.add_argument('--flows', default='all', help='comma-separated subset of: ' + ', '.join(FLOWS))
+    parser.add_argument('--output', help='write the results as JSON, e.g. benchmarks/sqlite-100k.json')
+    parser.add_argument('--compare', help='baseline JSON to diff against; exits 1 on a regression')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='allowed relative slowdown of p95 latency and throughput before a flow counts as regressed')
+    return parser.parse_args()
+
+
+# Seeding
+def chunked(rows, size=SEED_CHUNK_SIZE):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def person(rng):
+    return rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES), rng.choice(DEPARTMENTS), f"{rng.randint(1, 4)}-{rng.choice('ABCD')}"
+
+def seed_database(backend, args):
+    # Bulk inserts straight into the tables; the summary and capacity tables are then rebuilt like a migration would
+    db = backend.db
+    rng = random.Random(args.seed)
+    for pairs, name in ((args.registrations, 'registrations'), (args.attendance, 'attendance')):
+        if pairs > args.events * args.participants:
+            sys.exit(f"--{name} cannot exceed events x participants")
+
+    db.drop_all()
+    db.create_all()
+    today = date.today()
+    events = [{
+        'event_id': event_id,
+        'user_id': 1,
+        'event_name': f"Benchmark event {event_id}",
+        'event_description': 'Seeded by benchmark.py',
+        'type': rng.choice(['Seminar', 'Workshop', 'Assembly']),
+        'slot': None,
+        'speaker': f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+        'location': rng.choice(['Gym', 'AVR', 'Library', 'Hall A']),
+        'event_date': today + timedelta(days=rng.randint(-365, 90)),
+        'start_time': datetime(2000, 1, 1, 8).time(),
+        'end_time': datetime(2000, 1, 1, 17).time(),
+        'created_at': datetime(2024, 1, 1),
+        'updated_at': datetime(2024, 1, 1)
+    } for event_id in range(1, args.events + 1)]
+    for chunk in chunked(events):
+        db.session.execute(backend.Event.__table__.insert(), chunk)
+    event_dates = {event['event_id']: event['event_date'] for event in events}
+
+    # One hash for everyone: hashing 100k passwords would dominate the seeding time
+    password_hash = generate_password_hash(BENCH_PASSWORD)
+    people = {}
+    def participants():
+        for student_id in range(1, args.participants + 1):
+            first_name, last_name, department, year_and_block = people[student_id] = person(rng)
+            yield {
+                'student_Id': student_id, 'password': password_hash, 'firstName': first_name,
+                'lastName': last_name, 'email': f"student{student_id}@example.edu", 'department': department
+            }
+    for chunk in chunked(participants()):
+        db.session.execute(backend.Participant.__table__.insert(), chunk)
+
+    # Row i pairs event i % events with student i // events, so every (event, student) pair is unique
+    def pairs(count):
+        for i in range(count):
+            event_id = i % args.events + 1
+            student_id = i // args.events + 1
+            yield i, event_id, student_id, people[student_id]
+
+    def registrations():
+        for i, event_id, student_id, (first_name, last_name, department, year_and_block) in pairs(args.registrations):
+            yield {
+                'event_id': event_id, 'student_id': student_id, 'firstName': first_name, 'lastName': last_name,
+                'year_and_block': year_and_block, 'department': department,
+                'registration_date': datetime(2024, 1, 1), 'registration_status': 'registered'
+            }
+    for chunk in chunked(registrations()):
+        db.session.execute(backend.EventRegistration.__table__.insert(), chunk)
+
+    def attendance():
+        for i, event_id, student_id, (first_name, last_name, department, year_and_block) in pairs(args.attendance):
+            check_in = datetime.combine(event_dates[event_id], datetime.min.time()) + timedelta(hours=8, minutes=i % 90)
+            yield {
+                'event_id': event_id, 'student_id': student_id, 'firstName': first_name, 'lastName': last_name,
+                'year_and_block': year_and_block, 'department': department, 'check_in': check_in,
+                'check_out': check_in + timedelta(minutes=30 + i % 240) if i % 5 else None, 'status': 'Present'
+            }
+    for chunk in chunked(attendance()):
+        db.session.execute(backend.Attendance.__table__.insert(), chunk)
+    db.session.commit()
+
+    # Builds the report summaries and seat counters from the seeded rows
+    backend.migrate_schema()
+
+def prepare_database(backend, args):
+    # Returns the app to benchmark; a SQLite file is seeded once per size and seed, then copied for every run
+    if not args.database.startswith('sqlite:///'):
+        app = backend.create_app({'SQLALCHEMY_DATABASE_URI': args.database})
+        with app.app_context():
+            seed_logged(backend, args)
+        return app
+
+    path = args.database[len('sqlite:///'):]
+    root, ext = os.path.splitext(path)
+    template = f"{root}-seed{args.seed}-p{args.participants}-e{args.events}-r{args.registrations}-a{args.attendance}{ext or '.db'}"
+    if not os.path.exists(template):
+        seed_app = backend.create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{template}.tmp"})
+        with seed_app.app_context():
+            seed_logged(backend, args)
+            backend.db.session.execute(text('PRAGMA wal_checkpoint(TRUNCATE)'))
+            backend.db.engine.dispose()
+        os.replace(f"{template}.tmp", template)
+        for suffix in ('-wal', '-shm'):
+            if os.path.exists(f"{template}.tmp{suffix}"):
+                os.remove(f"{template}.tmp{suffix}")
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    shutil.copyfile(template, path)
+    return backend.create_app({'SQLALCHEMY_DATABASE_URI': args.database})
+
+def seed_logged(backend, args):
+    started = time.perf_counter()
+    print(f"Seeding {args.participants} participants, {args.events} events, "
+          f"{args.registrations} registrations and {args.attendance} attendance rows...")
+    seed_database(backend, args)
+    print(f"Seeded in {time.perf_counter() - started:.1f}s")
+
+
+# Flows: each takes the test client and the request's sequence number within that flow
+def build_flows(args):
+    new_student_base = args.participants + 1  # ids above the seeded participants
+
+    def signup(client, n):
+        student_id = new_student_base + n
+        first_name, last_name, department, _ = person(random.Random(student_id))
+        return client.post('/api/participant/signup', json={
+            'student_Id': student_id, 'password': BENCH_PASSWORD, 'firstName': first_name,
+            'lastName': last_name, 'email': f"student{student_id}@example.edu", 'department': department
+        })
+
+    def login(client, n):
+        return client.post('/api/participant/login', json={
+            'student_Id': n % args.participants + 1, 'password': BENCH_PASSWORD
+        })
+
+    def register(client, n):
+        first_name, last_name, department, year_and_block = person(random.Random(n))
+        return client.post('/api/register', json={
+            'event_id': n % args.events + 1, 'student_id': str(new_student_base + n),
+            'fullname': f"{first_name} {last_name}", 'year_and_block': year_and_block, 'department': department
+        })
+
+    def scan(client, n):
+        # Check-in and check-out use the same sequence, so the n-th check-out closes the n-th check-in
+        first_name, last_name, department, year_and_block = person(random.Random(n))
+        return client.post('/api/attendance', json={
+            'event_id': n % args.events + 1, 'student_id': 2 * new_student_base + n,
+            'fullname': f"{first_name} {last_name}", 'year_and_block': year_and_block, 'department': department
+        })
+
+    def list_events(client, n):
+        return client.get('/api/events?limit=50')
+
+    def dashboard(client, n):
+        return client.get(f"/api/events/{n % args.events + 1}/dashboard")
+
+    def reports(client, n):
+        return client.get('/api/reports/events')
+
+    return {
+        'signup': signup,
+        'login': login,
+        'register': register,
+        'check_in': scan,
+        'check_out': scan,
+        'list_events': list_events,
+        'dashboard': dashboard,
+        'reports': reports
+    }
+
+FLOWS = ['signup', 'login', 'register', 'check_in', 'check_out', 'list_events', 'dashboard', 'reports']
+
+
+# Measuring
+class StatementCounter:
+    # Counts the SQL statements issued by the current thread, i.e. by the request it is serving
+    def __init__(self):
+        self._local = threading.local()
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self._local.count = getattr(self._local, 'count', 0) + 1
+
+    def reset(self):
+        self._local.count = 0
+
+    def read(self):
+        return getattr(self._local, 'count', 0)
+
+def percentile(sorted_values, fraction):
+    # Nearest-rank percentile
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))]
+
+def run_level(app, flow, sequence, concurrency, requests, statements):
+    samples = []
+    issued = itertools.count()
+    lock = threading.Lock()
+
+    def worker():
+        client = app.test_client()
+        while True:
+            with lock:
+                if next(issued) >= requests:
+                    return
+                n = next(sequence)
+            statements.reset()
+            start = time.perf_counter()
+            response = flow(client, n)
+            response.get_data()
+            samples.append((time.perf_counter() - start, response.status_code, statements.read()))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for future in [executor.submit(worker) for _ in range(concurrency)]:
+            future.result()
+    wall = time.perf_counter() - started
+
+    latencies = sorted(sample[0] * 1000 for sample in samples)
+    statuses = {}
+    for _, status, _ in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    sql = [sample[2] for sample in samples]
+    return {
+        'requests': len(samples),
+        'errors': sum(1 for _, status, _ in samples if status >= 500),
+        'status_codes': statuses,
+        'throughput_rps': round(len(samples) / wall, 1),
+        'latency_ms': {
+            'p50': round(percentile(latencies, 0.50), 2),
+            'p95': round(percentile(latencies, 0.95), 2),
+            'p99': round(percentile(latencies, 0.99), 2),
+            'max': round(latencies[-1], 2) if latencies else 0.0
+        },
+        'sql_per_request': {
+            'mean': round(sum(sql) / len(sql), 2) if sql else 0.0,
+            'max': max(sql, default=0)
+        }
+    }
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# Reporting
+def print_results(results):
+    print(f"{'flow':<12} {'threads':>7} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'sql/req':>8} {'5xx':>5}")
+    for flow, levels in results.items():
+        for level, result in levels.items():
+            latency = result['latency_ms']
+            print(f"{flow:<12} {level:>7} {result['throughput_rps']:>9} {latency['p50']:>9} {latency['p95']:>9} "
+                  f"{latency['p99']:>9} {result['sql_per_request']['mean']:>8} {result['errors']:>5}")
+
+def compare_results(baseline, results, tolerance):
+    # SQL counts are deterministic and must not grow; timings may drift within the tolerance
+    regressions = []
+    for flow, levels in results.items():
+        for level, result in levels.items():
+            before = baseline.get('results', {}).get(flow, {}).get(level)
+            if before is None:
+                continue
+            checks = [
+                ('p95 latency', before['latency_ms']['p95'], result['latency_ms']['p95'],
+                 result['latency_ms']['p95'] > before['latency_ms']['p95'] * (1 + tolerance)),
+                ('throughput', before['throughput_rps'], result['throughput_rps'],
+                 result['throughput_rps'] < before['throughput_rps'] * (1 - tolerance)),
+                ('sql/request', before['sql_per_request']['mean'], result['sql_per_request']['mean'],
+                 result['sql_per_request']['mean'] > before['sql_per_request']['mean']),
+                ('5xx errors', before['errors'], result['errors'], result['errors'] > before['errors'])
+            ]
+            for metric, old, new, regressed in checks:
+                if regressed:
+                    regressions.append(f"{flow} @ {level} threads: {metric} {old} -> {new}")
+    return regressions
+
+def main():
+    args = parse_args()
+    if args.database.startswith('sqlite:///'):
+        # Flask-SQLAlchemy resolves relative SQLite paths under the app's instance folder, while the template is
+        # copied relative to the working directory; an absolute path keeps both in the same place
+        args.database = 'sqlite:///' + os.path.abspath(args.database[len('sqlite:///'):])
+    flows = FLOWS if args.flows == 'all' else args.flows.split(',')
+    unknown = set(flows) - set(FLOWS)
+    if unknown:
+        sys.exit(f"Unknown flows: {', '.join(sorted(unknown))}")
+    levels = [int(level) for level in args.concurrency.split(',')]
+
+    # app.py builds its module-level app from the environment at import time
+    os.environ['DATABASE_URL'] = args.database
+    os.environ.setdefault('SECRET_KEY', 'benchmark-secret')
+    import app as backend
+    from sqlalchemy import event as sqlalchemy_event
+
+    app = prepare_database(backend, args)
+    statements = StatementCounter()
+    with app.app_context():
+        sqlalchemy_event.listen(backend.db.engine, 'before_cursor_execute', statements)
+        dialect = backend.db.engine.dialect.name
+
+    handlers = build_flows(args)
+    results = {}
+    for flow in flows:
+        sequence = itertools.count()
+        results[flow] = {}
+        for level in levels:
+            results[flow][str(level)] = run_level(app, handlers[flow], sequence, level, args.requests, statements)
+
+    print_results(results)
+    report = {
+        'meta': {
+            'dialect': dialect,
+            'participants': args.participants,
+            'events': args.events,
+            'registrations': args.registrations,
+            'attendance': args.attendance,
+            'seed': args.seed,
+            'requests_per_level': args.requests,
+            'concurrency': levels,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'commit': git_commit()
+        },
+        'results': results
+    }
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"Results written to {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare_results(json.load(f), results, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {args.compare}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,252 @@
+# Caches in front of the database and the QR renderer, and the SQLite file store they share with the
+# attendance journal and the live feed when several workers run on one host
+import hashlib
+import os
+import pickle
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from types import SimpleNamespace
+
+from credentials import render_qr_png
+from metrics import qr_render_time
+from models import Event
+
+class SQLiteFileStore:
+    # Base for the local stand-ins for shared services: one SQLite file in WAL mode, visible to every process
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def _connect(self):
+        # sqlite3 connections cannot be shared between threads, so keep one per thread
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+# Event read-through cache
+class MemoryCacheBackend:
+    # In-process LRU; entries carry their own expiry time. With max_entries=None nothing is evicted before it
+    # expires, and expired entries are swept whenever the store has doubled since the last sweep
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._sweep_size = 1024
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            now = time.time()
+            self._entries[key] = (value, now + ttl)
+            self._entries.move_to_end(key)
+            if self.max_entries is None:
+                if len(self._entries) > self._sweep_size:
+                    for expired in [name for name, entry in self._entries.items() if entry[1] <= now]:
+                        del self._entries[expired]
+                    self._sweep_size = max(2 * len(self._entries), 1024)
+                return
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def size(self):
+        return len(self._entries)
+
+class SQLiteCacheBackend(SQLiteFileStore):
+    # Stand-in for a shared cache such as Redis: every worker on the host sees the same entries and invalidations
+    def __init__(self, path, max_entries):
+        super().__init__(path)
+        self.max_entries = max_entries
+        self._connect().execute(
+            'CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB NOT NULL, '
+            'expires_at REAL NOT NULL, used_at REAL NOT NULL)'
+        )
+
+    def get(self, key):
+        conn = self._connect()
+        now = time.time()
+        row = conn.execute('SELECT value FROM cache WHERE key = ? AND expires_at > ?', (str(key), now)).fetchone()
+        if row is None:
+            return None
+        conn.execute('UPDATE cache SET used_at = ? WHERE key = ?', (now, str(key)))
+        return pickle.loads(row[0])
+
+    def set(self, key, value, ttl):
+        conn = self._connect()
+        now = time.time()
+        conn.execute('INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)', (str(key), pickle.dumps(value), now + ttl, now))
+        # Drop expired entries, then the least recently used beyond the size limit (if there is one)
+        conn.execute('DELETE FROM cache WHERE expires_at <= ?', (now,))
+        if self.max_entries is None:
+            return
+        conn.execute(
+            'DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY used_at DESC LIMIT -1 OFFSET ?)',
+            (self.max_entries,)
+        )
+
+    def delete(self, key):
+        self._connect().execute('DELETE FROM cache WHERE key = ?', (str(key),))
+
+    def size(self):
+        return self._connect().execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+
+def make_cache_backend(url, max_entries):
+    # 'memory://' (default) or 'sqlite:///path/to/cache.db' to share entries between workers;
+    # max_entries=None keeps every entry until its TTL expires
+    if url.startswith('sqlite:///'):
+        return SQLiteCacheBackend(url[len('sqlite:///'):], max_entries)
+    return MemoryCacheBackend(max_entries)
+
+class ReadThroughCache:
+    # Loads missing keys through `loader` and counts hits and misses (under a lock, since request threads share it)
+    def __init__(self, backend, loader, ttl):
+        self.backend = backend
+        self.loader = loader
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
+    def get(self, key):
+        value = self.backend.get(key)
+        with self._stats_lock:
+            if value is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if value is not None:
+            return value
+        value = self.loader(key)
+        if value is not None:
+            self.backend.set(key, value, self.ttl)
+        return value
+
+    def refresh(self, key, value):
+        self.backend.set(key, value, self.ttl)
+
+    def invalidate(self, key):
+        self.backend.delete(key)
+
+    def stats(self):
+        with self._stats_lock:
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "size": self.backend.size(),
+            "ttl": self.ttl
+        }
+
+EVENT_COLUMNS = [column.name for column in Event.__table__.columns]
+
+def event_snapshot(event):
+    return {column: getattr(event, column) for column in EVENT_COLUMNS}
+
+def load_event(event_id):
+    event = Event.query.get(event_id)
+    return event_snapshot(event) if event else None
+
+event_cache = ReadThroughCache(
+    make_cache_backend(os.environ.get('EVENT_CACHE_URL', 'memory://'), int(os.environ.get('EVENT_CACHE_SIZE', 1024))),
+    load_event,
+    ttl=int(os.environ.get('EVENT_CACHE_TTL', 60))
+)
+
+def get_cached_event(event_id):
+    # Read-only copy of the event row; use Event.query.get when the row is going to be modified
+    values = event_cache.get(event_id)
+    return SimpleNamespace(**values) if values else None
+
+
+# QR code rendering
+QR_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'qrcodes')
+QR_CACHE_SIZE = 256
+
+class QRCache:
+    # Rendered QR images keyed by a hash of their payload: a bounded in-memory LRU in front of PNG files on disk
+    def __init__(self, directory, max_entries):
+        self.directory = directory
+        self.max_entries = max_entries
+        self._images = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(payload):
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"qr_{key}.png")
+
+    def get(self, payload):
+        png = self.peek(payload)
+        if png is None:
+            png, seconds = render_qr_png(payload)
+            qr_render_time.observe(seconds)
+            self.store(payload, png)
+        return self.key(payload), png
+
+    def peek(self, payload):
+        # Cached image from memory or disk, without rendering on a miss
+        key = self.key(payload)
+        with self._lock:
+            png = self._images.get(key)
+            if png is not None:
+                self._images.move_to_end(key)
+                return png
+        try:
+            with open(self._path(key), 'rb') as f:
+                png = f.read()
+        except FileNotFoundError:
+            return None
+        self._remember(key, png)
+        return png
+
+    def store(self, payload, png, remember=True):
+        # Write to a temporary file first so concurrent readers never see a partial PNG
+        key = self.key(payload)
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(png)
+        os.replace(tmp_path, self._path(key))
+        if remember:
+            self._remember(key, png)
+
+    def _remember(self, key, png):
+        with self._lock:
+            self._images[key] = png
+            self._images.move_to_end(key)
+            while len(self._images) > self.max_entries:
+                self._images.popitem(last=False)
+
+    def invalidate(self, payload):
+        key = self.key(payload)
+        with self._lock:
+            self._images.pop(key, None)
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+qr_cache = QRCache(QR_CACHE_DIR, QR_CACHE_SIZE)
@@ -0,0 +1,19 @@
+# CPU-bound helpers run in the worker process pool. This module only imports qrcode and werkzeug,
+# so the pool's processes start without importing app.py (and its database, logging and cache setup).
+import io
+import time
+
+import qrcode
+from werkzeug.security import generate_password_hash
+
+
+def render_qr_png(payload):
+    # Also returns the render time, so renders done in worker processes are recorded by the server process
+    started = time.perf_counter()
+    img_byte_arr = io.BytesIO()
+    qrcode.make(payload).save(img_byte_arr, format='PNG')
+    return img_byte_arr.getvalue(), time.perf_counter() - started
+
+
+def prepare_participant_credentials(password, qr_payload):
+    return (generate_password_hash(password), *render_qr_png(qr_payload))
@@ -0,0 +1,117 @@
+# Live attendance feed (Server-Sent Events): each recorded scan is published as a numbered delta per event,
+# and the stream route in app.py replays them to dashboards
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from cache import SQLiteFileStore
+from metrics import log_event
+
+FEED_HISTORY = 1000  # messages kept per event for clients resuming with Last-Event-ID
+FEED_KEEPALIVE = 15  # seconds between keep-alive comments on an idle stream
+
+class MemoryFeedBackend:
+    # Per-process feed: sequence numbers count up per event and recent messages are kept for resuming clients
+    def __init__(self, history):
+        self.history = history
+        self._messages = {}
+        self._latest = {}
+        self._changed = threading.Condition()
+
+    def publish(self, event_id, message):
+        with self._changed:
+            seq = self._latest.get(event_id, 0) + 1
+            self._latest[event_id] = seq
+            self._messages.setdefault(event_id, deque(maxlen=self.history)).append((seq, message))
+            self._changed.notify_all()
+        return seq
+
+    def latest(self, event_id):
+        with self._changed:
+            return self._latest.get(event_id, 0)
+
+    def read(self, event_id, after, timeout):
+        with self._changed:
+            self._changed.wait_for(lambda: self._latest.get(event_id, 0) > after, timeout)
+            return [(seq, message) for seq, message in self._messages.get(event_id, ()) if seq > after]
+
+class SQLiteFeedBackend(SQLiteFileStore):
+    # Shares the feed between worker processes on one host
+    POLL_INTERVAL = 0.25  # seconds
+
+    def __init__(self, path, history):
+        super().__init__(path)
+        self.history = history
+        self._connect().execute(
+            'CREATE TABLE IF NOT EXISTS attendance_feed ('
+            'event_id INTEGER NOT NULL, seq INTEGER NOT NULL, message TEXT NOT NULL, PRIMARY KEY (event_id, seq))'
+        )
+
+    def publish(self, event_id, message):
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            seq = conn.execute(
+                'SELECT COALESCE(MAX(seq), 0) + 1 FROM attendance_feed WHERE event_id = ?', (event_id,)
+            ).fetchone()[0]
+            conn.execute('INSERT INTO attendance_feed VALUES (?, ?, ?)', (event_id, seq, json.dumps(message)))
+            conn.execute('DELETE FROM attendance_feed WHERE event_id = ? AND seq <= ?', (event_id, seq - self.history))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return seq
+
+    def latest(self, event_id):
+        return self._connect().execute(
+            'SELECT COALESCE(MAX(seq), 0) FROM attendance_feed WHERE event_id = ?', (event_id,)
+        ).fetchone()[0]
+
+    def read(self, event_id, after, timeout):
+        conn = self._connect()
+        deadline = time.monotonic() + timeout
+        while True:
+            rows = conn.execute(
+                'SELECT seq, message FROM attendance_feed WHERE event_id = ? AND seq > ? ORDER BY seq',
+                (event_id, after)
+            ).fetchall()
+            if rows or time.monotonic() >= deadline:
+                return [(seq, json.loads(message)) for seq, message in rows]
+            time.sleep(self.POLL_INTERVAL)
+
+def make_feed_backend(url):
+    # 'memory://' (default) or 'sqlite:///path/to/feed.db' for several workers on one host
+    if url.startswith('sqlite:///'):
+        return SQLiteFeedBackend(url[len('sqlite:///'):], FEED_HISTORY)
+    return MemoryFeedBackend(FEED_HISTORY)
+
+attendance_feed = make_feed_backend(os.environ.get('ATTENDANCE_FEED_URL', 'memory://'))
+
+def check_in_delta(row):
+    return {
+        'type': 'check_in',
+        'student_id': row['student_id'],
+        'firstName': row['firstName'],
+        'lastName': row['lastName'],
+        'year_and_block': row['year_and_block'],
+        'department': row['department'],
+        'check_in': row['check_in'].strftime('%Y-%m-%d %H:%M:%S'),
+        'status': row['status']
+    }
+
+def check_out_delta(student_id, check_out):
+    return {'type': 'check_out', 'student_id': student_id, 'check_out': check_out.strftime('%Y-%m-%d %H:%M:%S')}
+
+def publish_attendance(event_id, messages):
+    # Called after the commit; a feed failure must never fail the scan that was already recorded
+    try:
+        for message in messages:
+            attendance_feed.publish(event_id, message)
+    except Exception:
+        log_event('attendance_feed_failed', logging.ERROR, exc_info=True, event_id=event_id)
+
+def sse_message(event, seq, data):
+    return f"id: {seq}\nevent: {event}\ndata: {json.dumps(data)}\n\n"
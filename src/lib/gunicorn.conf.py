@@ -0,0 +1,21 @@
+# Production serving for app.py, run from src/lib:
+#   gunicorn -c gunicorn.conf.py app:app
+import multiprocessing
+import os
+
+bind = os.environ.get('BIND', '0.0.0.0:5000')
+
+# Several worker processes, each serving requests on a pool of threads
+worker_class = 'gthread'
+workers = int(os.environ.get('WEB_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('WEB_THREADS', 8))  # keep DB_POOL_SIZE + DB_MAX_OVERFLOW at or above this
+
+# Workers import the app after fork, so each one builds its own SQLAlchemy connection pool
+preload_app = False
+
+# Logins waiting for a password check hold a thread each; app.py admits LOGIN_QUEUE_LIMIT of them per worker
+# (default LOGIN_WORKERS + 2, capped at WEB_THREADS - 1) and answers the rest with 503
+# Attendance streams (SSE) hold a thread each; app.py caps them per worker (FEED_MAX_STREAMS, keep it below
+# WEB_THREADS) and ends each one after FEED_STREAM_LIFETIME seconds, when the browser reconnects
+timeout = int(os.environ.get('WEB_TIMEOUT', 120))
+keepalive = 5
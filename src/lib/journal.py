@@ -0,0 +1,170 @@
+# Write-behind attendance: with ATTENDANCE_JOURNAL_PATH set, scans are appended to a local SQLite journal and
+# answered with 202; a background thread applies them to the attendance table in order, in batches of
+# JOURNAL_FLUSH_BATCH. Validating and applying the scans stays with the attendance routes in app.py.
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from flask import current_app
+
+from cache import SQLiteFileStore
+from metrics import log_event
+from models import AppliedScan, db
+
+JOURNAL_FLUSH_BATCH = int(os.environ.get('JOURNAL_FLUSH_BATCH', 500))
+JOURNAL_FLUSH_INTERVAL = float(os.environ.get('JOURNAL_FLUSH_INTERVAL', 0.5))  # seconds
+JOURNAL_RETRY_LIMIT = 30  # seconds between attempts while the database is unreachable
+APPLIED_SCAN_RETENTION = 7 * 24 * 3600  # seconds an idempotency key is remembered after it was applied
+
+class AttendanceJournal(SQLiteFileStore):
+    # Durable queue shared by the worker processes on one host; a row stays until its scan has been applied
+    LEASE_SECONDS = 30
+
+    def __init__(self, path):
+        super().__init__(path)
+        conn = self._connect()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS attendance_journal ('
+            'seq INTEGER PRIMARY KEY AUTOINCREMENT, scan_key TEXT NOT NULL UNIQUE, '
+            'scan TEXT NOT NULL, queued_at REAL NOT NULL)'
+        )
+        # Only the process holding the lease flushes, so scans are applied in the order they were queued
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS journal_lease ('
+            'id INTEGER PRIMARY KEY CHECK (id = 1), owner TEXT, expires_at REAL NOT NULL)'
+        )
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = super()._connect()
+            # A scan answered with 202 has to survive a power cut, not just a crash
+            conn.execute('PRAGMA synchronous=FULL')
+        return conn
+
+    def append(self, entries):
+        # entries: [(scan_key, scan)]; a key already in the journal is a client retry and is ignored
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            queued_at = time.time()
+            conn.executemany(
+                'INSERT OR IGNORE INTO attendance_journal (scan_key, scan, queued_at) VALUES (?, ?, ?)',
+                [(key, json.dumps(scan), queued_at) for key, scan in entries]
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def pending(self, limit):
+        rows = self._connect().execute(
+            'SELECT seq, scan_key, scan FROM attendance_journal ORDER BY seq LIMIT ?', (limit,)
+        ).fetchall()
+        return [(seq, key, json.loads(scan)) for seq, key, scan in rows]
+
+    def remove(self, seqs):
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany('DELETE FROM attendance_journal WHERE seq = ?', [(seq,) for seq in seqs])
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def stats(self):
+        count, oldest = self._connect().execute(
+            'SELECT COUNT(*), MIN(queued_at) FROM attendance_journal'
+        ).fetchone()
+        return {'pending': count, 'oldest_age': round(time.time() - oldest, 3) if oldest else None}
+
+    def acquire_lease(self, owner):
+        conn = self._connect()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute('INSERT OR IGNORE INTO journal_lease VALUES (1, NULL, 0)')
+            acquired = conn.execute(
+                'UPDATE journal_lease SET owner = ?, expires_at = ? WHERE id = 1 AND (owner = ? OR expires_at < ?)',
+                (owner, now + self.LEASE_SECONDS, owner, now)
+            ).rowcount
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return bool(acquired)
+
+def make_attendance_journal(path):
+    return AttendanceJournal(path) if path else None
+
+attendance_journal = make_attendance_journal(os.environ.get('ATTENDANCE_JOURNAL_PATH'))
+
+def scan_idempotency_key(event_id, student_id, scanned_at, client_key=None):
+    # Scanners should send a scan_id (or the scan time) so a retried request maps to the same key;
+    # without either, the server's receive time is all that tells two scans apart
+    material = f"{event_id}:client:{client_key}" if client_key else f"{event_id}:{student_id}:{scanned_at.isoformat()}"
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+def prune_applied_scans():
+    cutoff = datetime.utcfromtimestamp(time.time() - APPLIED_SCAN_RETENTION)
+    removed = AppliedScan.query.filter(AppliedScan.applied_at < cutoff).delete(synchronize_session=False)
+    db.session.commit()
+    return removed
+
+
+class AttendanceFlusher:
+    # One background thread per server process; it only flushes while holding the journal lease
+    def __init__(self, journal, flush):
+        # flush(journal, limit) applies up to `limit` queued scans and returns how many it took
+        self.journal = journal
+        self.flush = flush
+        self.reset()
+
+    def reset(self):
+        # Threads do not survive fork, so a forked worker starts its own flusher on its first queued scan
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._owner = f"{os.getpid()}:{uuid.uuid4().hex}"
+        self.last_error = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                app = current_app._get_current_object()
+                self._thread = threading.Thread(target=self._run, args=(app,), name='attendance-flusher', daemon=True)
+                self._thread.start()
+
+    def notify(self):
+        self._wakeup.set()
+
+    def _run(self, app):
+        delay = JOURNAL_FLUSH_INTERVAL
+        last_prune = 0
+        while True:
+            self._wakeup.wait(delay)
+            self._wakeup.clear()
+            try:
+                if not self.journal.acquire_lease(self._owner):
+                    delay = AttendanceJournal.LEASE_SECONDS / 2
+                    continue
+                with app.app_context():
+                    while self.flush(self.journal, JOURNAL_FLUSH_BATCH) == JOURNAL_FLUSH_BATCH:
+                        self.journal.acquire_lease(self._owner)
+                    if time.time() - last_prune > 3600:
+                        prune_applied_scans()
+                        last_prune = time.time()
+                    db.session.remove()
+                self.last_error = None
+                delay = JOURNAL_FLUSH_INTERVAL
+            except Exception as e:
+                # Leave the scans queued and back off until the database is reachable again
+                self.last_error = str(e)
+                log_event('journal_flush_failed', logging.ERROR, exc_info=True)
+                delay = min(max(delay * 2, 1), JOURNAL_RETRY_LIMIT)
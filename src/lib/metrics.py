@@ -0,0 +1,194 @@
+# Observability: structured JSON logs and per-process request metrics, served by /metrics in app.py
+import atexit
+import bisect
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import threading
+import time
+import traceback
+from collections import defaultdict
+from datetime import datetime
+from types import SimpleNamespace
+
+from flask import g, has_request_context, request
+from sqlalchemy import event as sqlalchemy_event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+
+# Structured logging: one JSON object per line, written by a background thread so request threads never wait on stdout
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+LOG_SAMPLE_RATE = float(os.environ.get('LOG_SAMPLE_RATE', 0.01))  # share of routine per-request events that are written
+logger = logging.getLogger('easynergy')
+
+def configure_logging():
+    if logger.handlers:
+        return
+    log_queue = queue.SimpleQueue()
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    listener = logging.handlers.QueueListener(log_queue, handler)
+    listener.start()
+    atexit.register(listener.stop)
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    logger.setLevel(LOG_LEVEL)
+    logger.propagate = False
+
+def log_event(event, level=logging.INFO, sampled=False, exc_info=False, **fields):
+    # Routine events pass sampled=True and only LOG_SAMPLE_RATE of them are written; warnings and errors never are sampled
+    if sampled and random.random() >= LOG_SAMPLE_RATE:
+        return
+    if not logger.isEnabledFor(level):
+        return
+    record = {
+        'ts': datetime.utcnow().isoformat(timespec='milliseconds') + 'Z',
+        'level': logging.getLevelName(level),
+        'event': event
+    }
+    if has_request_context():
+        record.update(method=request.method, route=request_route())
+    record.update(fields)
+    if exc_info:
+        record['error'] = traceback.format_exc()
+    logger.log(level, json.dumps(record, default=str))
+
+# Request metrics, kept per process and exposed in Prometheus text format at /metrics
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)  # seconds
+STATEMENT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 250)
+SLOW_REQUEST_SECONDS = int(os.environ.get('SLOW_REQUEST_MS', 500)) / 1000
+SLOW_LOG_STATEMENTS = 10  # slowest statements written with a slow request
+MAX_TRACKED_STATEMENTS = 500  # statements remembered per request for the slow log
+
+def prometheus_labels(names, values, **extra):
+    pairs = list(zip(names, values)) + list(extra.items())
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+class Counter:
+    def __init__(self, name, documentation, label_names=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self._values = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] += amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            values = sorted(self._values.items())
+        for label_values, value in values:
+            yield f"{self.name}{prometheus_labels(self.label_names, label_values)} {value:g}"
+
+class Histogram:
+    def __init__(self, name, documentation, label_names=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}  # label values -> per-bucket counts, then sum and count
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            snapshot = sorted((labels, list(series)) for labels, series in self._series.items())
+        for label_values, series in snapshot:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                yield f"{self.name}_bucket{prometheus_labels(self.label_names, label_values, le=f'{bound:g}')} {cumulative}"
+            yield f"{self.name}_bucket{prometheus_labels(self.label_names, label_values, le='+Inf')} {series[-1]}"
+            yield f"{self.name}_sum{prometheus_labels(self.label_names, label_values)} {series[-2]:g}"
+            yield f"{self.name}_count{prometheus_labels(self.label_names, label_values)} {series[-1]}"
+
+request_duration = Histogram('http_request_duration_seconds', 'Request latency by route.', ('method', 'route'))
+requests_total = Counter('http_requests_total', 'Requests by route and status code.', ('method', 'route', 'status'))
+request_statements = Histogram('http_request_db_statements', 'SQL statements issued per request.', ('route',),
+                               STATEMENT_BUCKETS)
+request_db_time = Histogram('http_request_db_seconds', 'Time spent in SQL statements per request.', ('route',))
+pool_checkout_wait = Histogram('db_pool_checkout_wait_seconds', 'Time spent waiting for a pooled connection.')
+qr_render_time = Histogram('qr_render_seconds', 'Time to render one QR code PNG.')
+METRICS = [request_duration, requests_total, request_statements, request_db_time, pool_checkout_wait, qr_render_time]
+
+class TimedQueuePool(QueuePool):
+    # QueuePool that records how long each checkout waited for a free connection
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_checkout_wait.observe(time.perf_counter() - started)
+
+def request_route():
+    # The URL rule keeps the label set small: '/api/events/<int:event_id>' instead of every event id
+    return request.url_rule.rule if request.url_rule else 'unmatched'
+
+@sqlalchemy_event.listens_for(Engine, 'before_cursor_execute')
+def start_statement_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info['statement_started'] = time.perf_counter()
+
+@sqlalchemy_event.listens_for(Engine, 'after_cursor_execute')
+def record_statement(conn, cursor, statement, parameters, context, executemany):
+    stats = g.get('request_stats') if has_request_context() else None
+    if stats is None:
+        return
+    elapsed = time.perf_counter() - conn.info.pop('statement_started', time.perf_counter())
+    stats.statement_count += 1
+    stats.statement_time += elapsed
+    if len(stats.statements) < MAX_TRACKED_STATEMENTS:
+        stats.statements.append((elapsed, statement))
+
+def start_request_stats():
+    g.request_stats = SimpleNamespace(started=time.perf_counter(), statement_count=0, statement_time=0.0, statements=[])
+
+def record_request_stats(response):
+    stats = g.pop('request_stats', None)
+    if stats is None:
+        return response
+    # Streamed bodies (SSE, exports) are timed up to the first byte
+    elapsed = time.perf_counter() - stats.started
+    route = request_route()
+    request_duration.observe(elapsed, request.method, route)
+    requests_total.inc(request.method, route, str(response.status_code))
+    request_statements.observe(stats.statement_count, route)
+    request_db_time.observe(stats.statement_time, route)
+    if elapsed >= SLOW_REQUEST_SECONDS:
+        slowest = sorted(stats.statements, key=lambda item: item[0], reverse=True)[:SLOW_LOG_STATEMENTS]
+        log_event(
+            'slow_request', logging.WARNING, status=response.status_code, duration_ms=round(elapsed * 1000, 1),
+            statement_count=stats.statement_count, statement_ms=round(stats.statement_time * 1000, 1),
+            statements=[{'ms': round(seconds * 1000, 1), 'sql': statement[:1000]} for seconds, statement in slowest]
+        )
+    return response
+
+def pool_gauges(pool):
+    gauges = [('db_pool_connections_in_use', 'Connections currently checked out of the pool.', 'checkedout'),
+              ('db_pool_connections_idle', 'Connections idle in the pool.', 'checkedin'),
+              ('db_pool_overflow', 'Connections open beyond the pool size.', 'overflow')]
+    for name, documentation, method in gauges:
+        if hasattr(pool, method):
+            yield f"# HELP {name} {documentation}"
+            yield f"# TYPE {name} gauge"
+            yield f"{name} {getattr(pool, method)()}"
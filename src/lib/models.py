@@ -0,0 +1,399 @@
+# Database models and the set-based helpers that keep their counters, seats and indexes consistent
+import json
+import logging
+from datetime import datetime
+
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import and_, func, inspect, or_, text
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from metrics import log_event
+
+db = SQLAlchemy()
+
+# Database Models
+class Event(db.Model):
+    __tablename__ = 'event'
+    event_id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer)
+    event_name = db.Column(db.String(255))
+    event_description = db.Column(db.Text)
+    type = db.Column(db.String(255), nullable=True)  # Added 'type' column
+    slot = db.Column(db.Integer, nullable=True)  # Added 'size' column
+    speaker = db.Column(db.String(255))
+    location = db.Column(db.String(255))
+    event_date = db.Column(db.Date)
+    start_time = db.Column(db.Time)
+    end_time = db.Column(db.Time)
+    created_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)
+
+    # Keyset pagination of the events listing walks this index
+    __table_args__ = (db.Index('ix_event_date_event_id', 'event_date', 'event_id'),)
+
+class Attendance(db.Model):
+    __tablename__ = 'attendance'
+    attendance_ID = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    event_id = db.Column(db.Integer, db.ForeignKey('event.event_id'), nullable=False)
+    student_id = db.Column(db.Integer, nullable=False)
+    firstName = db.Column(db.String(256))
+    lastName = db.Column(db.String(256))
+    year_and_block = db.Column(db.String(50), nullable=False)
+    department = db.Column(db.String(256), nullable=False)
+    check_in = db.Column(db.DateTime, nullable=True)  
+    check_out = db.Column(db.DateTime, nullable=True)  
+    status = db.Column(db.String(20), nullable=False)
+
+    # One attendance row per student per event, enforced by the database
+    __table_args__ = (db.Index('uq_attendance_event_student', 'event_id', 'student_id', unique=True),)
+
+class Participant(db.Model):
+    __tablename__ = 'participant'
+    student_Id = db.Column(db.Integer, primary_key=True)
+    password = db.Column(db.String(256))
+    firstName = db.Column(db.String(256))
+    lastName = db.Column(db.String(256))
+    email = db.Column(db.String(256))
+    department = db.Column(db.Text)
+    qr_code = db.deferred(db.Column(db.LargeBinary))  # PNG bytes, only loaded when the image is requested
+
+class User(db.Model):
+    __tablename__ = 'user'
+    user_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    username = db.Column(db.String(255), unique=True, nullable=False)
+    password = db.Column(db.String(256), nullable=False)
+    email = db.Column(db.String(255), unique=True, nullable=False)
+    role = db.Column(db.String(50), nullable=False)
+    created_at = db.Column(db.DateTime, default=db.func.now())
+    updated_at = db.Column(db.DateTime, default=db.func.now(), onupdate=db.func.now())
+
+class EventRegistration(db.Model):
+    __tablename__ = 'event_registration'
+
+    registration_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    event_id = db.Column(db.Integer, nullable=False)  # Foreign key to the Events table
+    student_id = db.Column(db.Integer, nullable=False)
+    firstName = db.Column(db.String(256))
+    lastName = db.Column(db.String(256))
+    year_and_block = db.Column(db.String(256), nullable=False)
+    department = db.Column(db.String(256), nullable=False)
+    registration_date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    registration_status = db.Column(db.String(256), nullable=False, default="registered")
+
+    # One registration per student per event, enforced by the database
+    __table_args__ = (db.Index('uq_registration_event_student', 'event_id', 'student_id', unique=True),)
+
+class EventSummary(db.Model):
+    __tablename__ = 'event_summary'
+
+    # Per-event counters kept up to date by the registration and attendance write paths
+    event_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    registration_count = db.Column(db.Integer, nullable=False, default=0)
+    check_in_count = db.Column(db.Integer, nullable=False, default=0)
+    check_out_count = db.Column(db.Integer, nullable=False, default=0)
+    # Check-ins by students holding a confirmed registration; walk-ins only count in check_in_count
+    registered_check_in_count = db.Column(db.Integer, nullable=False, default=0)
+
+class EventCapacity(db.Model):
+    __tablename__ = 'event_capacity'
+
+    # Seats left per event, taken with a conditional UPDATE; NULL means the event has no slot limit
+    event_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    remaining = db.Column(db.Integer, nullable=True)
+
+class DataVersion(db.Model):
+    __tablename__ = 'data_version'
+
+    # Bumped in the same transaction as every write, e.g. 'events' or 'attendance:<event_id>'; drives ETags
+    name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+class AppliedScan(db.Model):
+    __tablename__ = 'applied_scan'
+
+    # Idempotency keys of write-behind scans, stored in the transaction that applied them
+    scan_key = db.Column(db.String(64), primary_key=True)
+    applied_at = db.Column(db.DateTime, nullable=False, index=True)
+
+class ArchivedEvent(db.Model):
+    __tablename__ = 'archived_event'
+
+    # Events whose registration and attendance rows were moved to column files by `flask archive-events`;
+    # the counters and per-group analytics totals keep reports working without reading the files
+    event_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    archived_at = db.Column(db.DateTime, nullable=False)
+    registration_count = db.Column(db.Integer, nullable=False, default=0)
+    check_in_count = db.Column(db.Integer, nullable=False, default=0)
+    check_out_count = db.Column(db.Integer, nullable=False, default=0)
+    analytics = db.Column(db.Text, nullable=False)
+
+
+# Database helpers
+UNIQUE_INDEXES = [
+    # (model, primary key, index, sort key ranking duplicates: the first row is kept)
+    (Attendance, 'attendance_ID', 'uq_attendance_event_student',
+     lambda row: (row.check_out is None, row.check_in is None, row.attendance_ID)),
+    (EventRegistration, 'registration_id', 'uq_registration_event_student', lambda row: row.registration_id),
+]
+
+def remove_duplicate_rows(model, pk, rank):
+    # Keep the best-ranked row per (event_id, student_id) and log every row deleted, so nothing disappears unseen
+    duplicated = db.session.query(model.event_id, model.student_id).group_by(
+        model.event_id, model.student_id
+    ).having(func.count() > 1).all()
+    removed = 0
+    for event_id, student_id in duplicated:
+        rows = sorted(model.query.filter_by(event_id=event_id, student_id=student_id), key=rank)
+        for row in rows[1:]:
+            log_event('duplicate_row_removed', logging.WARNING, table=model.__tablename__, kept=getattr(rows[0], pk),
+                      row={column.name: getattr(row, column.name) for column in model.__table__.columns})
+            db.session.delete(row)
+            removed += 1
+    db.session.commit()
+    return removed
+
+def ensure_unique_indexes():
+    # Databases created before the composite indexes existed may already hold duplicates,
+    # so remove them before adding each index
+    inspector = inspect(db.engine)
+    created = []
+    for model, pk, index_name, rank in UNIQUE_INDEXES:
+        if index_name in {index['name'] for index in inspector.get_indexes(model.__tablename__)}:
+            continue
+        remove_duplicate_rows(model, pk, rank)
+        next(index for index in model.__table__.indexes if index.name == index_name).create(db.engine)
+        created.append(index_name)
+    return created
+
+# Non-unique indexes added after the first release
+ADDED_INDEXES = [
+    (Event, 'ix_event_date_event_id'),
+]
+
+def ensure_indexes():
+    inspector = inspect(db.engine)
+    created = []
+    for model, index_name in ADDED_INDEXES:
+        if index_name in {index['name'] for index in inspector.get_indexes(model.__tablename__)}:
+            continue
+        next(index for index in model.__table__.indexes if index.name == index_name).create(db.engine)
+        created.append(index_name)
+    return created
+
+# Columns added after the first release; create_all() does not alter existing tables
+ADDED_COLUMNS = [
+    (Participant, 'qr_code'),
+    (EventSummary, 'registered_check_in_count'),
+]
+
+def ensure_columns():
+    inspector = inspect(db.engine)
+    added = []
+    for model, column_name in ADDED_COLUMNS:
+        table = model.__tablename__
+        if column_name in {column['name'] for column in inspector.get_columns(table)}:
+            continue
+        column_type = model.__table__.c[column_name].type.compile(dialect=db.engine.dialect)
+        db.session.execute(text(f"ALTER TABLE {table} ADD COLUMN {column_name} {column_type}"))
+        db.session.commit()
+        added.append(f"{table}.{column_name}")
+    return added
+
+def migrate_schema():
+    # Tables added since the baseline schema (event_summary, data_version, ...) have to exist before
+    # their columns and indexes can be checked
+    existing = set(inspect(db.engine).get_table_names())
+    db.create_all()
+    tables = sorted(set(db.metadata.tables) - existing)
+    columns = ensure_columns()
+    unique_indexes = ensure_unique_indexes()
+    changes = tables + columns + unique_indexes + ensure_indexes()
+    # Backfill the report counters the first time the summary table (or a new counter) exists,
+    # and recount them once duplicate rows were removed
+    new_counter = any(column.startswith(f"{EventSummary.__tablename__}.") for column in columns)
+    if (new_counter or unique_indexes or EventSummary.query.first() is None) and rebuild_event_summary():
+        changes.append('event_summary')
+    if init_event_capacity():
+        db.session.commit()
+        changes.append('event_capacity')
+    return changes
+
+def insert_ignore(model, rows):
+    # Insert rows and let the unique indexes silently skip duplicates; returns how many were inserted
+    if db.engine.dialect.name == 'mysql':
+        stmt = mysql_insert(model.__table__).prefix_with('IGNORE')
+    else:
+        stmt = sqlite_insert(model.__table__).on_conflict_do_nothing()
+    return db.session.execute(stmt, rows).rowcount
+
+def upsert_add(model, key, counts):
+    # One upsert adding `counts` to the row identified by `key`; it commits or rolls back with the caller's write
+    table = model.__table__
+    increments = {column: table.c[column] + amount for column, amount in counts.items()}
+    if db.engine.dialect.name == 'mysql':
+        stmt = mysql_insert(table).values(**key, **counts).on_duplicate_key_update(**increments)
+    else:
+        stmt = sqlite_insert(table).values(**key, **counts).on_conflict_do_update(
+            index_elements=list(key), set_=increments
+        )
+    db.session.execute(stmt)
+
+def increment_event_summary(event_id, **counts):
+    upsert_add(EventSummary, {'event_id': event_id}, counts)
+
+def bump_versions(*names):
+    for name in names:
+        upsert_add(DataVersion, {'name': name}, {'version': 1})
+
+def rebuild_event_summary():
+    # Recompute every counter from the source tables with GROUP BY
+    registrations = dict(
+        db.session.query(EventRegistration.event_id, func.count(EventRegistration.registration_id))
+        .filter(EventRegistration.registration_status == 'registered')
+        .group_by(EventRegistration.event_id).all()
+    )
+    attendance = {
+        event_id: (check_ins, check_outs)
+        for event_id, check_ins, check_outs in db.session.query(
+            Attendance.event_id, func.count(Attendance.check_in), func.count(Attendance.check_out)
+        ).group_by(Attendance.event_id)
+    }
+    registered_check_ins = dict(
+        db.session.query(Attendance.event_id, func.count(Attendance.check_in))
+        .join(EventRegistration, and_(
+            EventRegistration.event_id == Attendance.event_id,
+            EventRegistration.student_id == Attendance.student_id
+        )).filter(EventRegistration.registration_status == 'registered')
+        .group_by(Attendance.event_id).all()
+    )
+    # Archived events keep their counters; late rows written after archiving are still counted on top.
+    # Their registered check-ins are the 'attended' totals of the stored analytics groups.
+    for event_id, registration_count, check_ins, check_outs, analytics in db.session.query(
+        ArchivedEvent.event_id, ArchivedEvent.registration_count, ArchivedEvent.check_in_count,
+        ArchivedEvent.check_out_count, ArchivedEvent.analytics
+    ):
+        registrations[event_id] = registrations.get(event_id, 0) + registration_count
+        live_check_ins, live_check_outs = attendance.get(event_id, (0, 0))
+        attendance[event_id] = (live_check_ins + check_ins, live_check_outs + check_outs)
+        registered_check_ins[event_id] = registered_check_ins.get(event_id, 0) + sum(
+            group[3] for group in json.loads(analytics)
+        )
+    rows = [
+        {
+            'event_id': event_id,
+            'registration_count': registrations.get(event_id, 0),
+            'check_in_count': attendance.get(event_id, (0, 0))[0],
+            'check_out_count': attendance.get(event_id, (0, 0))[1],
+            'registered_check_in_count': registered_check_ins.get(event_id, 0)
+        }
+        for event_id in set(registrations) | set(attendance)
+    ]
+    EventSummary.query.delete()
+    if rows:
+        db.session.execute(EventSummary.__table__.insert(), rows)
+    db.session.commit()
+    return len(rows)
+
+# Slot capacity and waitlist
+def init_event_capacity(event_ids=None):
+    # Seat counters for events that have none yet: slot minus confirmed registrations, in set-based queries
+    missing = db.session.query(Event.event_id, Event.slot).outerjoin(
+        EventCapacity, EventCapacity.event_id == Event.event_id
+    ).filter(EventCapacity.event_id.is_(None))
+    if event_ids is not None:
+        missing = missing.filter(Event.event_id.in_(event_ids))
+    missing = missing.all()
+    if not missing:
+        return 0
+    registered = dict(
+        db.session.query(EventRegistration.event_id, func.count(EventRegistration.registration_id))
+        .filter(EventRegistration.event_id.in_([event_id for event_id, _ in missing]),
+                EventRegistration.registration_status == 'registered')
+        .group_by(EventRegistration.event_id).all()
+    )
+    return insert_ignore(EventCapacity, [
+        {'event_id': event_id, 'remaining': slot - registered.get(event_id, 0) if slot and slot > 0 else None}
+        for event_id, slot in missing
+    ])
+
+def decrement_seats(event_id):
+    # Atomic: only succeeds while seats remain, so concurrent workers can never overbook
+    return EventCapacity.query.filter(
+        EventCapacity.event_id == event_id,
+        or_(EventCapacity.remaining.is_(None), EventCapacity.remaining > 0)
+    ).update({'remaining': EventCapacity.remaining - 1}, synchronize_session=False)
+
+def take_seat(event_id):
+    if decrement_seats(event_id):
+        return True
+    # Full, or an event without a counter yet (a primary-key lookup tells which)
+    if db.session.query(EventCapacity.event_id).filter_by(event_id=event_id).first() is None:
+        init_event_capacity([event_id])
+        return bool(decrement_seats(event_id))
+    return False
+
+def release_seat(event_id):
+    EventCapacity.query.filter(
+        EventCapacity.event_id == event_id, EventCapacity.remaining.isnot(None)
+    ).update({'remaining': EventCapacity.remaining + 1}, synchronize_session=False)
+
+def promote_from_waitlist(event_id):
+    # Confirms the longest-waiting registration; the caller has already secured the seat
+    candidate = db.session.query(
+        EventRegistration.registration_id, EventRegistration.student_id, EventRegistration.year_and_block
+    ).filter_by(event_id=event_id, registration_status='waitlisted').order_by(
+        EventRegistration.registration_date, EventRegistration.registration_id
+    ).with_for_update().first()
+    if candidate is None:
+        return None
+    promoted = EventRegistration.query.filter_by(
+        registration_id=candidate.registration_id, registration_status='waitlisted'
+    ).update({'registration_status': 'registered'}, synchronize_session=False)
+    return candidate if promoted else None
+
+def fill_from_waitlist(event_id):
+    # After a capacity increase, move waitlisted students into the new seats
+    promoted = []
+    while take_seat(event_id):
+        candidate = promote_from_waitlist(event_id)
+        if candidate is None:
+            release_seat(event_id)
+            break
+        increment_event_summary(event_id, registration_count=1,
+                                registered_check_in_count=checked_in_count(event_id, [candidate.student_id]))
+        promoted.append(candidate)
+    return promoted
+
+def checked_in_count(event_id, student_ids):
+    # How many of these students already have a check-in, for moving them in or out of the registered counter
+    if not student_ids:
+        return 0
+    return db.session.query(func.count(Attendance.check_in)).filter(
+        Attendance.event_id == event_id, Attendance.student_id.in_(student_ids)
+    ).scalar()
+
+# Attendance analytics per department and year/block, also stored with every archived event
+def duration_seconds(start, end):
+    if db.engine.dialect.name == 'mysql':
+        return func.timestampdiff(text('SECOND'), start, end)
+    return (func.julianday(end) - func.julianday(start)) * 86400
+
+def analytics_groups(condition):
+    # One GROUP BY over registrations joined to their attendance row: the database does the per-row work
+    # and returns one row per (department, year_and_block)
+    seconds = duration_seconds(Attendance.check_in, Attendance.check_out)
+    return db.session.query(
+        EventRegistration.department,
+        EventRegistration.year_and_block,
+        func.count(EventRegistration.registration_id),
+        func.count(Attendance.attendance_ID),
+        func.sum(seconds),
+        func.count(seconds)
+    ).join(Event, Event.event_id == EventRegistration.event_id).outerjoin(Attendance, and_(
+        Attendance.event_id == EventRegistration.event_id,
+        Attendance.student_id == EventRegistration.student_id
+    )).filter(
+        EventRegistration.registration_status == 'registered',
+        condition
+    ).group_by(EventRegistration.department, EventRegistration.year_and_block).all()
@@ -0,0 +1,27 @@
+import os
+import sys
+
+import pytest
+
+# app.py reads its configuration from the environment at import time
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+os.environ.setdefault('SECRET_KEY', 'test-secret')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as backend  # noqa: E402
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    # Every test starts from a fresh database, so per-process state keyed by event id starts empty too
+    monkeypatch.setattr(backend, 'registration_index', backend.RegistrationIndex())
+    flask_app = backend.create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.db'}", 'TESTING': True})
+    with flask_app.app_context():
+        backend.db.create_all()
+        backend.migrate_schema()
+    return flask_app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
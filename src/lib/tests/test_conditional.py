@@ -0,0 +1,75 @@
+# Conditional GET and compression on the polled list endpoints (conditional_response in app.py)
+import gzip
+import json
+
+from sqlalchemy import event
+
+import app as backend
+from test_smoke import create_event
+
+
+def registration(event_id, student_id):
+    return {'event_id': event_id, 'student_id': str(student_id), 'fullname': 'Sol Tan',
+            'year_and_block': '2-C', 'department': 'CCS'}
+
+
+def etag(client, url):
+    response = client.get(url)
+    assert response.status_code == 200
+    return response.headers['ETag']
+
+
+def test_each_versioned_write_changes_the_etag(client):
+    event_id = create_event(client)
+    dashboard = f'/api/events/{event_id}/dashboard'
+    writes = [
+        ('/api/events', lambda: client.put('/api/events', json={'event_id': event_id, 'location': 'Hall'})),
+        (f'/api/event_registration/{event_id}', lambda: client.post('/api/register',
+                                                                    json=registration(event_id, 9001))),
+        (f'/api/event_attendance/{event_id}', lambda: client.post('/api/attendance',
+                                                                  json=registration(event_id, 9001))),
+    ]
+    for url, write in writes:
+        before, dashboard_before = etag(client, url), etag(client, dashboard)
+        assert write().status_code in (200, 201)
+        assert etag(client, url) != before
+        assert etag(client, dashboard) != dashboard_before
+
+
+def test_unchanged_etag_answers_304_without_reading_rows(app, client):
+    event_id = create_event(client)
+    client.post('/api/register', json=registration(event_id, 9101))
+    urls = ['/api/events', f'/api/event_registration/{event_id}', f'/api/event_attendance/{event_id}',
+            f'/api/events/{event_id}/dashboard']
+    tags = {url: etag(client, url) for url in urls}
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = backend.db.engine
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        for url in urls:
+            assert client.get(url, headers={'If-None-Match': tags[url]}).status_code == 304
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+    assert statements and all('FROM data_version' in statement for statement in statements), statements
+
+
+def test_large_lists_are_compressed_under_the_same_etag(client):
+    event_id = create_event(client, slot=50)
+    for student_id in range(9201, 9221):
+        client.post('/api/register', json=registration(event_id, student_id))
+    url = f'/api/event_registration/{event_id}'
+    plain = client.get(url)
+    compressed = client.get(url, headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in plain.headers
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in compressed.headers['Vary']
+    assert json.loads(gzip.decompress(compressed.get_data())) == plain.get_json()
+    assert compressed.headers['ETag'] == plain.headers['ETag']
+    # A short body is not worth compressing
+    small = client.get(f'/api/event_attendance/{event_id}', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in small.headers
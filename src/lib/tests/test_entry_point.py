@@ -0,0 +1,56 @@
+# Runs the development server the way the README starts it, so start-up problems that an in-process test client
+# cannot see (worker pool processes re-running app.py, missing configuration) show up in the suite
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+LIB_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def post_json(url, payload):
+    request = urllib.request.Request(url, data=json.dumps(payload).encode('utf-8'),
+                                     headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(request, timeout=30) as response:
+            return response.status
+    except urllib.error.HTTPError as error:
+        return error.code
+
+
+def test_signup_through_python_app_py(tmp_path):
+    port = free_port()
+    # As in the README: no SECRET_KEY and no FLASK_DEBUG, so app.py turns debug mode on by itself
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{tmp_path / 'dev.db'}", PORT=str(port), WORKER_PROCESSES='1')
+    for name in ('SECRET_KEY', 'FLASK_DEBUG'):
+        env.pop(name, None)
+    server = subprocess.Popen([sys.executable, 'app.py'], cwd=LIB_DIR, env=env, start_new_session=True,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.monotonic() + 60
+        while True:
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                break
+            except OSError:
+                assert server.poll() is None and time.monotonic() < deadline, 'development server did not start'
+                time.sleep(0.2)
+        for student_id in (9001, 9002):
+            assert post_json(f"http://127.0.0.1:{port}/api/participant/signup", {
+                'student_Id': student_id, 'password': 'pw', 'firstName': 'Lee', 'lastName': 'Mora',
+                'email': f"{student_id}@example.edu", 'department': 'CCS'
+            }) == 201
+    finally:
+        os.killpg(server.pid, signal.SIGTERM)
+        server.wait(timeout=30)
@@ -0,0 +1,102 @@
+# Write-behind attendance: scans are journaled without touching the database and applied exactly once by the flusher
+import pytest
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+
+import app as backend
+from journal import AttendanceJournal
+from test_smoke import create_event
+
+
+@pytest.fixture
+def journal(tmp_path, monkeypatch):
+    journal = AttendanceJournal(str(tmp_path / 'journal.db'))
+    monkeypatch.setattr(backend, 'attendance_journal', journal)
+    # The tests flush by hand instead of through the background thread
+    monkeypatch.setattr(backend.attendance_flusher, 'start', lambda: None)
+    return journal
+
+
+def flush(app, journal):
+    with app.app_context():
+        return backend.flush_attendance_journal(journal, backend.JOURNAL_FLUSH_BATCH)
+
+
+def summary_counts(app, event_id):
+    with app.app_context():
+        summary = backend.db.session.get(backend.EventSummary, event_id)
+        return summary.check_in_count, summary.check_out_count
+
+
+def register(client, event_id, student_id):
+    response = client.post('/api/register', json={'event_id': event_id, 'student_id': str(student_id),
+                                                  'fullname': 'Nia Ong', 'year_and_block': '3-A',
+                                                  'department': 'CAS'})
+    assert response.status_code == 201
+
+
+def test_scans_are_queued_while_the_database_is_down(app, client, journal):
+    event_id = create_event(client)
+    register(client, event_id, 8001)
+    with app.app_context():
+        qr = backend.participant_qr_payload(8001, 'Nia', 'Ong', 'CAS')
+        engine = backend.db.engine
+
+    def unreachable(*args):
+        raise OperationalError('SELECT 1', {}, Exception('database is down'))
+
+    event.listen(engine, 'before_cursor_execute', unreachable)
+    try:
+        assert client.post('/api/attendance', json={'event_id': event_id, 'qr': qr}).status_code == 202
+        response = client.post('/api/attendance/batch', json={'scans': [
+            {'event_id': event_id + 1000, 'student_id': 8002, 'fullname': 'Oli Pe', 'year_and_block': '3-A',
+             'department': 'CAS'},
+            {'event_id': event_id, 'qr': 'forged'}
+        ]})
+        assert [result['code'] for result in response.get_json()['results']] == [202, 403]
+        with pytest.raises(OperationalError):
+            flush(app, journal)
+        assert journal.stats()['pending'] == 2
+    finally:
+        event.remove(engine, 'before_cursor_execute', unreachable)
+
+    # Once the database is back the badge scan is applied and the scan for a missing event is dropped
+    assert flush(app, journal) == 2
+    assert journal.stats()['pending'] == 0
+    assert summary_counts(app, event_id) == (1, 0)
+
+
+def test_replayed_scan_id_is_applied_once(app, client, journal):
+    event_id = create_event(client)
+    scan = {'event_id': event_id, 'student_id': 8101, 'fullname': 'Pia Qu', 'year_and_block': '1-B',
+            'department': 'CCS', 'scan_id': 'scanner-7:42'}
+    first = client.post('/api/attendance', json=scan).get_json()['scan_id']
+    assert client.post('/api/attendance', json=scan).get_json()['scan_id'] == first
+    assert journal.stats()['pending'] == 1
+    flush(app, journal)
+    # A retry arriving after the flush would otherwise check the student out
+    client.post('/api/attendance/batch', json={'scans': [scan]})
+    flush(app, journal)
+    assert summary_counts(app, event_id) == (1, 0)
+
+
+def test_scans_left_in_the_journal_by_a_crash_are_applied_once(app, client, journal, tmp_path, monkeypatch):
+    event_id = create_event(client)
+    scans = [{'event_id': event_id, 'student_id': student_id, 'fullname': 'Rae Su', 'year_and_block': '4-C',
+              'department': 'CBA'} for student_id in (8201, 8202)]
+    assert client.post('/api/attendance/batch', json={'scans': scans}).status_code == 202
+
+    # The process dies after the scans were committed but before they left the journal
+    def crash(seqs):
+        raise SystemExit('killed')
+
+    monkeypatch.setattr(journal, 'remove', crash)
+    with pytest.raises(SystemExit):
+        flush(app, journal)
+    assert summary_counts(app, event_id) == (2, 0)
+
+    restarted = AttendanceJournal(str(tmp_path / 'journal.db'))
+    assert restarted.stats()['pending'] == 2
+    assert flush(app, restarted) == 2
+    assert restarted.stats()['pending'] == 0
+    assert summary_counts(app, event_id) == (2, 0)
@@ -0,0 +1,351 @@
+# End-to-end smoke tests over the main flows, so a change to a shared helper cannot silently break another feature
+import io
+import json
+import threading
+import zipfile
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+
+from sqlalchemy import event, text
+
+import app as backend
+import archive
+
+IMPORT_CSV = (
+    "student_Id,password,firstName,lastName,email,department\n"
+    "1001,secret1,Ana,Santos,ana@example.edu,CCS\n"
+    "1002,secret2,Ben,Reyes,ben@example.edu,CBA\n"
+)
+
+
+def test_import_participants_upload(client):
+    response = client.post('/api/participants/import', data=IMPORT_CSV, content_type='text/csv')
+    updates = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert response.status_code == 200
+    assert updates[-1] == {"done": True, "imported": 2, "skipped": 0, "errors": []}
+
+
+def test_import_participants_command(app, tmp_path):
+    csv_path = tmp_path / 'participants.csv'
+    csv_path.write_text(IMPORT_CSV)
+    result = app.test_cli_runner().invoke(args=['import-participants', str(csv_path)])
+    assert result.exception is None, result.output
+    assert 'Imported 2, skipped 0' in result.output
+
+
+
+def test_import_rechecks_emails_taken_during_the_import(app, tmp_path, monkeypatch):
+    csv_path = tmp_path / 'participants.csv'
+    csv_path.write_text(IMPORT_CSV)
+    pool_map = backend.pool_map
+
+    def signup_during_import(*args, **kwargs):
+        # Another student signs up with one of the file's emails after the up-front duplicate check
+        backend.db.session.add(backend.Participant(student_Id=1999, firstName='Bea', lastName='Reyes',
+                                                   email='ben@example.edu', department='CBA'))
+        backend.db.session.commit()
+        return pool_map(*args, **kwargs)
+
+    monkeypatch.setattr(backend, 'pool_map', signup_during_import)
+    result = app.test_cli_runner().invoke(args=['import-participants', str(csv_path)])
+    assert 'Line 3: Student ID or Email is already registered' in result.output, result.output
+    assert 'Imported 1, skipped 0' in result.output
+    with app.app_context():
+        assert backend.Participant.query.filter_by(email='ben@example.edu').count() == 1
+
+def test_signup_login_and_qr(client):
+    response = client.post('/api/participant/signup', json={
+        'student_Id': 2001, 'password': 'pw', 'firstName': 'Cy', 'lastName': 'Cruz',
+        'email': 'cy@example.edu', 'department': 'CTE'
+    })
+    assert response.status_code == 201
+    response = client.post('/api/participant/login', json={'student_Id': 2001, 'password': 'pw'})
+    assert response.status_code == 200
+    assert client.get('/api/participant/2001/qr.png').status_code == 200
+
+
+def login(client, student_id):
+    client.post('/api/participant/signup', json={
+        'student_Id': student_id, 'password': 'pw', 'firstName': 'Di', 'lastName': 'Go',
+        'email': f'{student_id}@example.edu', 'department': 'CTE'
+    })
+    response = client.post('/api/participant/login', json={'student_Id': student_id, 'password': 'pw'})
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_logged_out_tokens_stay_revoked(client):
+    tokens = login(client, 2101)
+    headers = {'Authorization': f"Bearer {tokens['access_token']}"}
+    assert client.get('/api/participant/me', headers=headers).status_code == 200
+    client.post('/api/participant/logout', headers=headers, json={'refresh_token': tokens['refresh_token']})
+    # Revocations are only dropped once they expire, however many other tokens are revoked meanwhile
+    for number in range(2000):
+        backend.revoked_tokens.set(f"other-{number}", True, 60)
+    assert client.get('/api/participant/me', headers=headers).status_code == 401
+    response = client.post('/api/participant/token/refresh', json={'refresh_token': tokens['refresh_token']})
+    assert response.status_code == 401
+
+
+def test_refresh_token_is_single_use(client):
+    refresh_token = login(client, 2102)['refresh_token']
+    response = client.post('/api/participant/token/refresh', json={'refresh_token': refresh_token})
+    assert response.status_code == 200
+    headers = {'Authorization': f"Bearer {response.get_json()['access_token']}"}
+    assert client.get('/api/participant/me', headers=headers).status_code == 200
+    response = client.post('/api/participant/token/refresh', json={'refresh_token': refresh_token})
+    assert response.status_code == 401
+
+
+def create_event(client, **fields):
+    event = dict({
+        'event_name': 'Orientation', 'event_description': 'Welcome', 'event_date': '2030-01-15',
+        'start_time': '09:00:00', 'end_time': '11:00:00', 'location': 'Gym', 'type': 'Seminar', 'slot': 10
+    }, **fields)
+    response = client.post('/api/events', json=event)
+    assert response.status_code == 201, response.get_json()
+    return response.get_json()['event_id']
+
+
+def test_event_create_and_update(client):
+    event_id = create_event(client)
+    response = client.put('/api/events', json={'event_id': event_id, 'start_time': '10:30:00', 'event_date': '2030-02-01'})
+    assert response.status_code == 200, response.get_json()
+    event = client.get(f'/events/{event_id}').get_json()
+    assert '10:30' in str(event['start_time'])
+    assert client.put('/api/events', json={'event_id': event_id, 'start_time': 'noon'}).status_code == 400
+
+
+def test_qr_scan_rejected_after_cancellation_elsewhere(app, client, monkeypatch):
+    # Changes made by another worker are seen once the recheck interval has passed
+    monkeypatch.setattr(backend, 'REGISTRATION_RECHECK_INTERVAL', 0)
+    event_id = create_event(client)
+    registration = {'event_id': event_id, 'student_id': '4001', 'fullname': 'Eve Flores',
+                    'year_and_block': '2-B', 'department': 'CON'}
+    assert client.post('/api/register', json=registration).status_code == 201
+    with app.app_context():
+        qr = backend.participant_qr_payload(4001, 'Eve', 'Flores', 'CON')
+    assert client.post('/api/attendance', json={'event_id': event_id, 'qr': qr}).status_code == 201
+
+    # Another worker cancels: only the database and the version counter change
+    with app.app_context():
+        backend.EventRegistration.query.filter_by(event_id=event_id, student_id=4001).update(
+            {'registration_status': 'cancelled'})
+        backend.bump_versions(f"registrations:{event_id}")
+        backend.db.session.commit()
+    response = client.post('/api/attendance', json={'event_id': event_id, 'qr': qr})
+    assert response.status_code == 403
+
+
+
+def test_qr_scans_within_the_recheck_interval_skip_the_version_read(app, client):
+    event_id = create_event(client)
+    registration = {'event_id': event_id, 'student_id': '4101', 'fullname': 'Gus Hao',
+                    'year_and_block': '2-B', 'department': 'CON'}
+    assert client.post('/api/register', json=registration).status_code == 201
+    with app.app_context():
+        qr = backend.participant_qr_payload(4101, 'Gus', 'Hao', 'CON')
+        engine = backend.db.engine
+    assert client.post('/api/attendance', json={'event_id': event_id, 'qr': qr}).status_code == 201
+    statements = []
+    event.listen(engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+    assert client.post('/api/attendance', json={'event_id': event_id, 'qr': qr}).status_code == 200
+    assert not [statement for statement in statements if 'data_version.version' in statement and 'SELECT' in statement]
+
+    # A cancellation through this worker is seen immediately
+    assert client.post('/api/register/cancel', json={'event_id': event_id, 'student_id': 4101}).status_code == 200
+    assert client.post('/api/attendance', json={'event_id': event_id, 'qr': qr}).status_code == 403
+
+def test_event_pages_skip_undated_events(app, client):
+    for day in ('2030-01-01', '2030-01-02', '2030-01-03'):
+        create_event(client, event_date=day)
+    with app.app_context():
+        backend.db.session.add(backend.Event(event_name='Undated'))
+        backend.db.session.commit()
+
+    first = client.get('/api/events?limit=2', headers={'Origin': 'http://localhost:5173'})
+    assert first.status_code == 200
+    assert 'X-Next-Cursor' in first.headers['Access-Control-Expose-Headers']
+    second = client.get(f"/api/events?limit=2&cursor={first.headers['X-Next-Cursor']}")
+    assert [event['event_date'] for event in first.get_json() + second.get_json()] == [
+        '2030-01-01', '2030-01-02', '2030-01-03']
+    assert len(client.get('/api/events').get_json()) == 4
+
+
+def test_dashboard_counts_only_confirmed_registrations(client):
+    event_id = create_event(client, slot=1)
+    for student_id in ('5001', '5002'):
+        client.post('/api/register', json={'event_id': event_id, 'student_id': student_id, 'fullname': 'Fay Torres',
+                                           'year_and_block': '3-C', 'department': 'CCJE'})
+    counts = client.get(f'/api/events/{event_id}/dashboard').get_json()['counts']
+    assert counts['registered'] == 1
+    assert counts['waitlisted'] == 1
+    assert counts['registered_not_checked_in'] == 1
+
+
+def test_report_rate_ignores_walk_ins(client):
+    event_id = create_event(client)
+    client.post('/api/register', json={'event_id': event_id, 'student_id': '6001', 'fullname': 'Gil Uy',
+                                       'year_and_block': '1-A', 'department': 'CCS'})
+    for student_id in ('6001', '6002'):
+        response = client.post('/api/attendance', json={'event_id': event_id, 'student_id': student_id,
+                                                         'fullname': 'Gil Uy', 'year_and_block': '1-A',
+                                                         'department': 'CCS'})
+        assert response.status_code == 201
+    report = next(event for event in client.get('/api/reports/events').get_json()['events']
+                  if event['event_id'] == event_id)
+    dashboard = client.get(f'/api/events/{event_id}/dashboard').get_json()
+    assert report['check_in_count'] == 2
+    assert report['registered_check_in_count'] == 1
+    assert report['attendance_rate'] == dashboard['counts']['attendance_rate'] == 1.0
+
+
+def test_batch_scan_racing_another_scanner_checks_out(app, client, monkeypatch):
+    event_id = create_event(client)
+    scan = {'event_id': event_id, 'student_id': 7001, 'fullname': 'Hal Vega', 'year_and_block': '2-B',
+            'department': 'CBA'}
+    insert_ignore = backend.insert_ignore
+    raced = []
+
+    def insert_after_other_scanner(model, rows):
+        # Another worker commits this student's check-in between the batch's read and its insert
+        if model is backend.Attendance and not raced:
+            raced.append(insert_ignore(model, rows))
+            backend.db.session.commit()
+        return insert_ignore(model, rows)
+
+    monkeypatch.setattr(backend, 'insert_ignore', insert_after_other_scanner)
+    response = client.post('/api/attendance/batch', json={'scans': [scan]})
+    assert response.get_json()['results'][0]['code'] == 200
+    with app.app_context():
+        summary = backend.db.session.get(backend.EventSummary, event_id)
+        assert (summary.check_in_count, summary.check_out_count) == (0, 1)
+
+
+
+def test_batch_statement_count_does_not_grow_with_the_batch(app, client):
+    event_id = create_event(client, slot=100)
+    for student_id in range(7301, 7321):
+        client.post('/api/register', json={'event_id': event_id, 'student_id': str(student_id), 'fullname': 'Lu Mae',
+                                           'year_and_block': '2-B', 'department': 'CBA'})
+    statements = []
+    with app.app_context():
+        engine = backend.db.engine
+    event.listen(engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+    counts = []
+    for student_ids in (range(7301, 7303), range(7303, 7321), range(7321, 7341)):
+        del statements[:]
+        scans = [{'event_id': event_id, 'student_id': student_id, 'fullname': 'Lu Mae', 'year_and_block': '2-B',
+                  'department': 'CBA'} for student_id in student_ids]
+        assert client.post('/api/attendance/batch', json={'scans': scans}).get_json()['checked_in'] == len(scans)
+        counts.append(len(statements))
+    assert counts[0] == counts[1] == counts[2]
+    with app.app_context():
+        summary = backend.db.session.get(backend.EventSummary, event_id)
+        assert (summary.check_in_count, summary.registered_check_in_count) == (40, 20)
+
+def test_scans_rejected_before_insert_ignore(client):
+    event_id = create_event(client)
+    scan = {'event_id': event_id, 'student_id': 7101, 'fullname': 'Ivy Lim', 'year_and_block': '2-B',
+            'department': 'CBA'}
+    assert client.post('/api/attendance', json=dict(scan, event_id=event_id + 1000)).status_code == 404
+    assert client.post('/api/attendance', json=dict(scan, year_and_block='x' * 51)).status_code == 400
+    results = client.post('/api/attendance/batch', json={'scans': [dict(scan, event_id=event_id + 1000)]}).get_json()
+    assert results['results'][0]['code'] == 404
+
+
+def test_migration_keeps_the_completed_duplicate(app, client):
+    event_id = create_event(client)
+    with app.app_context():
+        db = backend.db
+        db.session.execute(text('DROP INDEX uq_attendance_event_student'))
+        check_in = datetime(2024, 5, 1, 8)
+        for check_out in (None, datetime(2024, 5, 1, 10)):
+            db.session.add(backend.Attendance(event_id=event_id, student_id=7201, firstName='Jo', lastName='Ko',
+                                              year_and_block='1-A', department='CCS', check_in=check_in,
+                                              check_out=check_out, status='Present'))
+        db.session.commit()
+        assert 'uq_attendance_event_student' in backend.migrate_schema()
+        rows = backend.Attendance.query.filter_by(event_id=event_id, student_id=7201).all()
+        assert [row.check_out for row in rows] == [datetime(2024, 5, 1, 10)]
+
+
+
+def test_migrate_schema_command_on_a_baseline_database(app, client):
+    event_id = create_event(client)
+    client.post('/api/register', json={'event_id': event_id, 'student_id': '7401', 'fullname': 'Mo Ng',
+                                       'year_and_block': '1-A', 'department': 'CCS'})
+    with app.app_context():
+        backend.db.session.execute(text('DROP TABLE event_summary'))
+        backend.db.session.execute(text('DROP TABLE data_version'))
+        backend.db.session.commit()
+    result = app.test_cli_runner().invoke(args=['migrate-schema'])
+    assert result.exit_code == 0, result.output
+    assert 'event_summary' in result.output
+    with app.app_context():
+        assert backend.db.session.get(backend.EventSummary, event_id).registration_count == 1
+
+
+def test_archived_event_is_read_from_its_files_and_closed_to_writes(app, client, tmp_path, monkeypatch):
+    monkeypatch.setattr(archive, 'ARCHIVE_DIR', str(tmp_path / 'archive'))
+    event_id = create_event(client, event_date='2020-03-01')
+    scan = {'event_id': event_id, 'student_id': '7501', 'fullname': 'Ned Oh', 'year_and_block': '4-A',
+            'department': 'CAS'}
+    assert client.post('/api/register', json=scan).status_code == 201
+    assert client.post('/api/attendance', json=scan).status_code == 201
+    result = app.test_cli_runner().invoke(args=['archive-events', '--days', '30'])
+    assert 'archived 1 registrations and 1 attendance rows' in result.output, result.output
+
+    registrations = client.get(f'/api/event_registration/{event_id}').get_json()['registrations']
+    assert [row['student_id'] for row in registrations] == [7501]
+    assert len(client.get(f'/api/event_attendance/{event_id}').get_json()['attendance']) == 1
+    # Late writes would slip past the unique indexes, which no longer see the archived rows
+    assert client.post('/api/register', json=scan).status_code == 409
+    assert client.post('/api/attendance', json=scan).status_code == 409
+    results = client.post('/api/attendance/batch', json={'scans': [scan]}).get_json()['results']
+    assert results[0]['code'] == 409
+    assert len(client.get(f'/api/event_attendance/{event_id}').get_json()['attendance']) == 1
+
+def test_attendance_streams_are_bounded(client, monkeypatch):
+    event_id = create_event(client)
+    monkeypatch.setattr(backend, 'FEED_STREAM_LIFETIME', 0)
+    monkeypatch.setattr(backend, 'feed_streams', threading.BoundedSemaphore(1))
+    response = client.get(f'/api/events/{event_id}/attendance/stream', headers={'Last-Event-ID': '0'})
+    assert response.status_code == 200
+    assert response.get_data(as_text=True).endswith('id: 0\n\n')
+    response.close()
+
+    assert backend.feed_streams.acquire(blocking=False)  # released when the first stream closed
+    assert client.get(f'/api/events/{event_id}/attendance/stream').status_code == 503
+
+
+def test_badge_zip_entry_names_are_sanitized(client):
+    event_id = create_event(client)
+    client.post('/api/register', json={'event_id': event_id, 'student_id': '8001', 'fullname': '..\\Kim ../../etc/x',
+                                       'year_and_block': '4-D', 'department': 'CON'})
+    response = client.get(f'/api/events/{event_id}/badges')
+    with zipfile.ZipFile(io.BytesIO(response.get_data())) as archive:
+        assert archive.namelist() == ['8001_etc-x_Kim.png']
+
+
+class BrokenPool:
+    def submit(self, *args, **kwargs):
+        raise BrokenProcessPool('a worker process died')
+
+    def map(self, *args, **kwargs):
+        raise BrokenProcessPool('a worker process died')
+
+    def shutdown(self, **kwargs):
+        pass
+
+
+def test_broken_worker_pool_answers_503_and_is_replaced(client, monkeypatch):
+    signup = {'student_Id': 2101, 'password': 'pw', 'firstName': 'Di', 'lastName': 'Ong', 'email': 'di@example.edu',
+              'department': 'CAS'}
+    monkeypatch.setattr(backend, '_worker_pool', BrokenPool())
+    assert client.post('/api/participant/signup', json=signup).status_code == 503
+    assert backend._worker_pool is None
+
+    monkeypatch.setattr(backend, '_worker_pool', BrokenPool())
+    assert client.post('/api/participants/import', data=IMPORT_CSV, content_type='text/csv').status_code == 503
+    assert backend._worker_pool is None